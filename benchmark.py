@@ -0,0 +1,231 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import argparse
+from generate_data import SYNTHETIC_DEFAULTS, write_synthetic_instance
+from dataset import DATASET_DIR, read_manifest
+from convergence import convergence_path
+from timetable_io import COLUMNAR_FORMATS, parquet_available
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+SIZES = [1, 2, 4, 8]        # Multipliers of the size-1 instance below
+MODELS = ["feasibility", "penalty"]
+TIME_LIMIT = 60             # Per solve
+REPEATS = 1                 # Runs per (size, model); later runs reuse the dataset and model caches
+SEED = 0
+RESULTS_FILE = 'benchmark_results.jsonl'
+
+# Size-1 instance: generate_data.py's synthetic generator with these
+# overrides of SYNTHETIC_DEFAULTS; SCALED_PARAMS are multiplied by the size
+BASE_INSTANCE = {}
+SCALED_PARAMS = ('cohorts', 'electives', 'rooms')
+
+# The scripts that are benchmarked, run inside the instance directory
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {'feasibility': 'new_model.py', 'penalty': 'penalty_model.py'}
+PENALTY_OUTPUT = 'timetable_output.json'
+
+# ==========================================
+# Scalability benchmark.
+# Every (size, model) run executes the real new_model.py (feasibility) or
+# penalty_model.py (penalty) as a fresh process, with the instance
+# directory as its working directory: the same loader/dataset path, model
+# and solution caches, solve and export as a normal run. Phase times come
+# from the scripts' own metrics (instrumentation.py), sizes from the
+# compiled dataset's manifest, bound and gap from the penalty model's
+# convergence file. One JSON line per run is appended to RESULTS_FILE,
+# tagged with the git commit, so results can be compared across commits.
+#
+# Instances come from the synthetic generator: cohorts, electives and
+# rooms grow with the size, so the clash graph gets denser across cohorts
+# and the room mix is drawn anew for every size.
+# ==========================================
+
+# Metrics phases -> reported time buckets (constraints.* phases count as build)
+PHASE_GROUPS = {
+    'load': 'load',
+    'input_snapshot': 'preprocess', 'enrollment': 'preprocess', 'instructor_map': 'preprocess',
+    'room_eligibility': 'preprocess', 'room_pools': 'preprocess', 'clash_graph': 'preprocess',
+    'greedy_start': 'preprocess',
+    'solution_cache': 'cache', 'model_cache': 'cache', 'model_cache_store': 'cache',
+    'variables': 'build', 'warm_start': 'build', 'objective': 'build',
+    'solve': 'solve', 'solve_fallback': 'solve',
+    'export': 'export',
+}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=REPO_DIR)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def instance_params(size, overrides=None):
+    """Generator parameters for an instance `size` times the size-1 instance."""
+    params = {**SYNTHETIC_DEFAULTS, **BASE_INSTANCE, **(overrides or {})}
+    for key in SCALED_PARAMS:
+        params[key] = params[key] * size
+    return params
+
+
+def run_script(cmd, cwd, log_path):
+    """
+    Run a model script to completion. Returns (exit code, peak RSS in MB).
+    The peak covers the script and its CBC child (wait4 reports the larger
+    of the two); None where wait4 does not exist (Windows).
+    """
+    with open(log_path, 'w') as log:
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        if not hasattr(os, 'wait4'):
+            return proc.wait(), None
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return proc.returncode, round(usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def read_metrics(path):
+    """The script's phase records (one run per file)."""
+    try:
+        with open(path, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def run_model(instance_dir, model, time_limit, run, solution_cache=False, columnar=None):
+    """
+    Run one model script on an instance. Returns the result record.
+    Without solution_cache the penalty model always solves (--refresh), so
+    repeated runs measure the warm dataset and model caches, not a lookup.
+    columnar: passed on as --columnar, so the export time includes the columnar copy.
+    """
+    metrics_path = os.path.join(instance_dir, f'{model}_metrics.jsonl')
+    conv_path = os.path.join(instance_dir, convergence_path(PENALTY_OUTPUT))
+    for stale in (metrics_path, conv_path):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    cmd = [sys.executable, os.path.join(REPO_DIR, SCRIPTS[model]), '--time-limit', str(time_limit),
+           '--metrics', os.path.basename(metrics_path)]
+    if model == 'penalty' and not solution_cache:
+        cmd.append('--refresh')
+    if columnar:
+        cmd += ['--columnar', columnar]
+    t = time.perf_counter()
+    exit_code, peak_rss = run_script(cmd, instance_dir, os.path.join(instance_dir, f'{model}.{run}.log'))
+    wall = time.perf_counter() - t
+
+    records = read_metrics(metrics_path)
+    phases = {r['phase']: r for r in records}
+    total = phases.get('total', {})
+    times = {}
+    for r in records:
+        if r['phase'] == 'total':
+            continue
+        group = 'build' if r['phase'].startswith('constraints.') else PHASE_GROUPS.get(r['phase'], 'other')
+        times[group] = times.get(group, 0.0) + r.get('wall_s', 0.0)
+
+    manifest = read_manifest(os.path.join(instance_dir, DATASET_DIR)) or {}
+    status = total.get('status')
+    objective = total.get('objective')
+    bound = gap = cbc_result = None
+    if model == 'feasibility':
+        if status == 'Optimal':
+            objective, bound, gap = 0.0, 0.0, 0.0   # constant objective: any feasible timetable is optimal
+    elif os.path.exists(conv_path):
+        with open(conv_path, 'r') as f:
+            final = json.load(f)['final']
+        bound, gap, cbc_result = final.get('bound'), final.get('gap'), final.get('result')
+
+    return {
+        'model': model,
+        'script': SCRIPTS[model],
+        'run': run,
+        'exit_code': exit_code,
+        **manifest.get('counts', {}),
+        'clash_pairs': phases.get('clash_graph', {}).get('clash_pairs'),
+        'variables': total.get('variables'),
+        'constraints': total.get('constraints'),
+        'times': {group: round(sec, 4) for group, sec in times.items()},
+        'script_wall_s': total.get('wall_s'),
+        'process_wall_s': round(wall, 4),
+        'peak_rss_mb': peak_rss,
+        'python_rss_mb': max((r['rss_mb'] for r in records if r.get('rss_mb') is not None), default=None),
+        'dataset_compiled': phases.get('load', {}).get('compiled'),
+        'model_cache_hit': phases.get('model_cache', {}).get('hit'),
+        'solution_cache_hit': total.get('cached', False),
+        'status': status,
+        'cbc_result': cbc_result,
+        'objective': objective,
+        'bound': bound,
+        'gap': gap,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OptiTime scalability benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help=f"instance sizes: {', '.join(SCALED_PARAMS)} of the size-1 instance times the size")
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help="seconds per solve")
+    parser.add_argument('--repeats', type=int, default=REPEATS,
+                        help="runs per size and model; runs after the first use the scripts' caches")
+    parser.add_argument('--solution-cache', action='store_true',
+                        help="let repeated penalty runs return the cached timetable instead of solving")
+    parser.add_argument('--elective-overlap', type=float, default=None,
+                        help="share of electives picked from the whole pool (clash density across cohorts)")
+    parser.add_argument('--columnar', choices=COLUMNAR_FORMATS, default=None,
+                        help="have both models also write a columnar timetable (timed as export)")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=RESULTS_FILE, help="JSON lines file results are appended to")
+    parser.add_argument('--keep-instances', metavar='DIR',
+                        help="write instances, logs, metrics and timetables under DIR instead of a temp dir")
+    args = parser.parse_args()
+    if args.columnar == 'parquet' and not parquet_available():
+        parser.error("--columnar parquet needs pyarrow (pip install pyarrow); use --columnar npz instead")
+
+    commit = git_commit()
+    run_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    base_dir = args.keep_instances or tempfile.mkdtemp(prefix='optitime_bench_')
+    overrides = {'elective_overlap': args.elective_overlap} if args.elective_overlap is not None else None
+    output = os.path.abspath(args.output)
+
+    print(f"Benchmarking sizes {args.sizes} (commit {commit}, {args.time_limit:g}s per solve)")
+    with open(output, 'a') as out:
+        for size in args.sizes:
+            instance_dir = os.path.join(base_dir, f'size_{size}')
+            os.makedirs(instance_dir, exist_ok=True)
+            params = instance_params(size, overrides)
+            t = time.perf_counter()
+            write_synthetic_instance(instance_dir, params, seed=args.seed)
+            generate_time = time.perf_counter() - t
+
+            for run in range(1, args.repeats + 1):
+                for model in args.models:
+                    record = run_model(instance_dir, model, args.time_limit, run, args.solution_cache, args.columnar)
+                    record = {'run_at': run_at, 'commit': commit, 'size': size, 'seed': args.seed,
+                              'params': params, 'time_limit': args.time_limit, 'columnar': args.columnar,
+                              'generate_time': round(generate_time, 4), **record}
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+
+                    times = record['times']
+                    print(f"   size {size:>3} run {run} | {model:<11} | {record.get('courses')} courses "
+                          f"{record.get('enrollments')} rows | {record['variables']} vars {record['constraints']} rows | "
+                          f"build {times.get('build', 0):.2f}s solve {times.get('solve', 0):.2f}s | "
+                          f"RSS {record['peak_rss_mb']} MB | {record['status']} obj {record['objective']} "
+                          f"gap {record['gap']}" + (f" | exit code {record['exit_code']}" if record['exit_code'] else ""))
+
+    print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# SOLVER CONVERGENCE TELEMETRY
+# ==========================================
+# CBC writes its progress to a log file (logPath); this module echoes it to
+# stdout while the solve runs and parses it afterwards into a time series
+#   [{"t": seconds, "event", "nodes", "incumbent", "bound", "gap"}, ...]
+# saved next to the timetable as <timetable>.convergence.json. The series
+# shows when the incumbent stopped improving and how the gap closed, which
+# is what SOLVER_TIME_LIMIT and the gapRel setting should be tuned against.
+
+NO_SOLUTION = 1e49   # CBC prints 1e+50 as 'best solution' before the first incumbent
+
+_NUM = r'(-?[\d.]+(?:e[+-]?\d+)?)'
+CBC_PATTERNS = [
+    # Continuous objective value is 1310.79 - 3.37 seconds
+    ('lp_relaxation', re.compile(rf'^Continuous objective value is {_NUM} - {_NUM} seconds')),
+    # Cbc0013I At root node, 12 cuts changed objective from 1310.79 to 1314.16 in 10 passes
+    ('root_cuts', re.compile(rf'^Cbc0013I At root node, \d+ cuts changed objective from {_NUM} to {_NUM}')),
+    # Cbc0012I Integer solution of 3625 found by feasibility pump after 0 iterations and 0 nodes (16.69 seconds)
+    # Cbc0004I Integer solution of 460 found after 1234 iterations and 12 nodes (5.30 seconds)
+    ('incumbent', re.compile(rf'^Cbc00\d\dI Integer solution of {_NUM} found .*and (\d+) nodes \({_NUM} seconds\)')),
+    # Cbc0010I After 100 nodes, 52 on tree, 460 best solution, best possible 420 (1.23 seconds)
+    ('progress', re.compile(rf'^Cbc0010I After (\d+) nodes, \d+ on tree, {_NUM} best solution, '
+                            rf'best possible {_NUM} \({_NUM} seconds\)')),
+    # Cbc0011I Exiting as integer gap of 20 less than 1e-10 or 5%
+    ('gap_exit', re.compile(rf'^Cbc0011I Exiting as integer gap of {_NUM} less than')),
+    # Cbc0001I Search completed - best objective 460, took 0 iterations and 0 nodes (0.37 seconds)
+    ('completed', re.compile(rf'^Cbc0001I Search completed - best objective {_NUM}, .*and (\d+) nodes \({_NUM} seconds\)')),
+]
+FINAL_PATTERNS = {
+    'result': re.compile(r'^Result - (.+)$'),
+    'objective': re.compile(rf'^Objective value:\s+{_NUM}'),
+    'bound': re.compile(rf'^Lower bound:\s+{_NUM}'),
+    'gap': re.compile(rf'^Gap:\s+{_NUM}'),
+    'nodes': re.compile(r'^Enumerated nodes:\s+(\d+)'),
+    'wall_s': re.compile(rf'^Time \(Wallclock seconds\):\s+{_NUM}'),
+}
+
+
+def relative_gap(incumbent, bound):
+    """Gap relative to the bound, as CBC reports it in its final 'Gap:' line."""
+    if incumbent is None or bound is None:
+        return None
+    if abs(incumbent - bound) < 1e-9:
+        return 0.0
+    return abs(incumbent - bound) / max(abs(bound), 1e-9)
+
+
+def parse_cbc_log(text):
+    """
+    Parse a CBC log. Returns (points, final): the convergence time series and
+    the end-of-run summary {result, objective, bound, gap, nodes, wall_s}.
+    The bound carried between events is the best one seen so far.
+    """
+    points = []
+    incumbent = bound = None
+    nodes = 0
+    t = 0.0
+    stopped_on_gap = False
+    final = {}
+    for line in text.splitlines():
+        line = line.strip()
+        for event, pattern in CBC_PATTERNS:
+            m = pattern.match(line)
+            if not m:
+                continue
+            g = m.groups()
+            if event == 'lp_relaxation':
+                bound, t = float(g[0]), float(g[1])
+            elif event == 'root_cuts':
+                bound = float(g[1])
+            elif event == 'incumbent':
+                incumbent, nodes, t = float(g[0]), int(g[1]), float(g[2])
+            elif event == 'progress':
+                nodes, t = int(g[0]), float(g[3])
+                best = float(g[1])
+                if best < NO_SOLUTION:
+                    incumbent = best
+                bound = float(g[2])
+            elif event == 'gap_exit':
+                stopped_on_gap = True
+                if incumbent is not None:
+                    bound = incumbent - float(g[0])
+            elif event == 'completed':
+                best, nodes, t = float(g[0]), int(g[1]), float(g[2])
+                if best < NO_SOLUTION:
+                    incumbent = best
+                    # A completed search without a gap exit proved the incumbent optimal
+                    bound = bound if stopped_on_gap else best
+            points.append({'t': t, 'event': event, 'nodes': nodes, 'incumbent': incumbent,
+                           'bound': bound, 'gap': relative_gap(incumbent, bound)})
+            break
+        for key, pattern in FINAL_PATTERNS.items():
+            m = pattern.match(line)
+            if m:
+                final[key] = m.group(1) if key == 'result' else (int(m.group(1)) if key == 'nodes' else float(m.group(1)))
+    if 'objective' in final and 'gap' not in final:
+        # 'Lower bound' and 'Gap' are only printed when the search stopped on a limit
+        final['bound'] = bound if bound is not None else final['objective']
+        final['gap'] = relative_gap(final['objective'], final['bound'])
+    return points, final
+
+
+def convergence_path(timetable_path):
+    return timetable_path.rsplit('.json', 1)[0] + '.convergence.json'
+
+
+def solver_log_path(timetable_path):
+    return timetable_path.rsplit('.json', 1)[0] + '.cbc.log'
+
+
+def save_convergence(path, points, final, **meta):
+    with open(path, 'w') as f:
+        json.dump({**meta, 'final': final, 'points': points}, f, indent=2)
+
+
+def summarise(points, final):
+    """One-line summary: first incumbent, last improvement, final gap."""
+    found = [p for p in points if p['event'] == 'incumbent']
+    if not found:
+        return "no incumbent found"
+    parts = [f"first incumbent {found[0]['incumbent']:g} at {found[0]['t']:.1f}s",
+             f"last improvement {found[-1]['incumbent']:g} at {found[-1]['t']:.1f}s",
+             f"{len(found)} incumbents"]
+    if final.get('gap') is not None:
+        parts.append(f"final gap {final['gap']:.2%}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def echo_log(path, stream=sys.stdout, poll=0.2):
+    """Follow the log file at path and copy new lines to stream until the block exits."""
+    # Start from a fresh file so the reader never follows a previous run's log
+    if os.path.exists(path):
+        os.remove(path)
+    stop = threading.Event()
+
+    def follow():
+        f = None
+        while f is None and not stop.is_set():
+            try:
+                f = open(path, 'r')
+            except FileNotFoundError:
+                time.sleep(poll)
+        if f is None:
+            return
+        with f:
+            while True:
+                line = f.readline()
+                if line:
+                    stream.write(line)
+                elif stop.is_set():
+                    break
+                else:
+                    time.sleep(poll)
+        stream.flush()
+
+    thread = threading.Thread(target=follow, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,229 @@
+import json
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from model_cache import file_digest
+from preprocess import load_enrollments, build_instructor_map, course_bundles
+
+# ==========================================
+# PREPROCESSED BINARY DATASET
+# ==========================================
+# `python dataset.py` compiles the three input CSVs into a directory of .npy
+# arrays (integer-coded enrollments, per-student course lists, enrollment
+# counts, course bundles for the clash graph) plus the small course and
+# room tables and the instructor map. load_dataset() memory-maps the
+# arrays, so the models, validate.py and visualize.py start without
+# re-parsing the enrollment CSV or re-deriving these structures.
+#
+# manifest.json records the format version, the pandas/numpy versions and
+# the size, mtime and SHA-256 of every source file. It is written last, so
+# a bundle without a manifest is incomplete. A source whose size or mtime
+# changed is re-hashed; if its content changed the bundle is recompiled
+# automatically on the next load.
+
+DATASET_DIR = os.path.join('.optitime_cache', 'dataset')
+DATASET_FORMAT_VERSION = 1
+SOURCE_FILES = {'courses': 'courses.csv', 'students': 'student_data_large.csv', 'rooms': 'rooms.csv'}
+
+MANIFEST = 'manifest.json'
+TABLES = 'tables.pkl'     # df_courses, df_rooms, instructor_map (small, pickled)
+
+
+def _source_stat(path):
+    st = os.stat(path)
+    return {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _atomic_write(path, write):
+    """Write through a temp file and rename, so readers never see a partial file."""
+    tmp = f"{path}.tmp{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _save_array(data_dir, name, array):
+    array = np.asarray(array)
+    if array.dtype == object:
+        array = array.astype(str)   # fixed-width unicode can be memory-mapped, objects cannot
+    # np.save appends .npy to names without it, so write through an open file
+    def write(tmp):
+        with open(tmp, 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+    _atomic_write(os.path.join(data_dir, name + '.npy'), write)
+
+
+def _load_array(data_dir, name):
+    return np.load(os.path.join(data_dir, name + '.npy'), mmap_mode='r', allow_pickle=False)
+
+
+def read_manifest(data_dir=DATASET_DIR):
+    try:
+        with open(os.path.join(data_dir, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_manifest(data_dir, manifest):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _atomic_write(os.path.join(data_dir, MANIFEST), write)
+
+
+def stale_reason(manifest, sources=SOURCE_FILES):
+    """
+    Why the bundle cannot be used, or None if it is current. Sources whose
+    size/mtime changed but whose content did not are accepted, and their
+    new stat is stored in manifest['sources'] (the caller saves it).
+    """
+    if manifest is None:
+        return "no compiled dataset"
+    if manifest.get('version') != DATASET_FORMAT_VERSION:
+        return f"format version {manifest.get('version')} != {DATASET_FORMAT_VERSION}"
+    if manifest.get('pandas') != pd.__version__ or manifest.get('numpy') != np.__version__:
+        return "compiled with other pandas/numpy versions"
+    if set(manifest['sources']) != set(sources):
+        return "different source files"
+    for name, path in sources.items():
+        recorded = manifest['sources'][name]
+        current = _source_stat(path)
+        if recorded['path'] != path:
+            return f"{name} source is now {path}"
+        if (recorded['size'], recorded['mtime_ns']) == (current['size'], current['mtime_ns']):
+            continue
+        if current['size'] != recorded['size'] or file_digest(path) != recorded['sha256']:
+            return f"{path} changed"
+        recorded['mtime_ns'] = current['mtime_ns']   # touched, same content
+    return None
+
+
+def compile_dataset(sources=SOURCE_FILES, data_dir=DATASET_DIR):
+    """Parse the source CSVs and write the bundle. Returns its manifest."""
+    os.makedirs(data_dir, exist_ok=True)
+    manifest_path = os.path.join(data_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)   # the bundle is incomplete until the new manifest is written
+
+    stats = {name: {**_source_stat(path), 'sha256': file_digest(path)} for name, path in sources.items()}
+    df_courses = pd.read_csv(sources['courses'])
+    df_rooms = pd.read_csv(sources['rooms'])
+    has_names = 'student_name' in pd.read_csv(sources['students'], nrows=0).columns
+    enrollments = load_enrollments(sources['students'], names=has_names)
+    df_students = enrollments['df_students']
+    bundle_course_ids, bundle_ptr, bundle_courses, bundle_sizes = course_bundles(df_students)
+
+    arrays = {
+        'student_codes': df_students['student_id'].cat.codes.to_numpy(),
+        'course_codes': df_students['course_id'].cat.codes.to_numpy(),
+        'students': enrollments['students'].to_numpy(),
+        'courses': enrollments['courses'].to_numpy(),
+        'enrollment_counts': np.array(list(enrollments['enrollment'].values()), dtype=np.int64),
+        'student_ptr': enrollments['student_ptr'],
+        'student_courses': enrollments['student_courses'],
+        'bundle_course_ids': np.array(bundle_course_ids, dtype=object),
+        'bundle_ptr': bundle_ptr,
+        'bundle_courses': bundle_courses,
+        'bundle_sizes': bundle_sizes,
+    }
+    if has_names:
+        arrays['student_names'] = enrollments['student_names']
+    for name, array in arrays.items():
+        _save_array(data_dir, name, array)
+
+    tables = {'df_courses': df_courses, 'df_rooms': df_rooms, 'instructor_map': build_instructor_map(df_courses)}
+    _atomic_write(os.path.join(data_dir, TABLES), lambda tmp: pd.to_pickle(tables, tmp))
+
+    manifest = {
+        'version': DATASET_FORMAT_VERSION,
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'compiled_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sources': stats,
+        'has_names': has_names,
+        'arrays': sorted(arrays),
+        'counts': {'enrollments': len(df_students), 'students': len(enrollments['students']),
+                   'courses': len(df_courses), 'rooms': len(df_rooms), 'bundles': len(bundle_sizes)},
+    }
+    _write_manifest(data_dir, manifest)
+    return manifest
+
+
+def load_dataset(sources=SOURCE_FILES, data_dir=DATASET_DIR, names=False):
+    """
+    Memory-map the compiled bundle, recompiling it first if it is missing or
+    stale. Returns a dict with the keys of preprocess.load_enrollments()
+    ('df_students', 'enrollment', 'students', 'courses', 'student_ptr',
+    'student_courses', and 'student_names' if names=True) plus 'df_courses',
+    'df_rooms', 'instructor_map', 'bundles' (the course_bundles() tuple, for
+    clash_graph_from_bundles()) and 'compiled' (True if this call rebuilt it).
+    Raises FileNotFoundError if a source file is missing.
+    """
+    manifest = read_manifest(data_dir)
+    recorded = json.dumps(manifest['sources'], sort_keys=True) if manifest else None
+    compiled = stale_reason(manifest, sources) is not None
+    if compiled:
+        manifest = compile_dataset(sources, data_dir)
+    elif json.dumps(manifest['sources'], sort_keys=True) != recorded:
+        _write_manifest(data_dir, manifest)   # remember the new mtimes of touched sources
+    if names and not manifest['has_names']:
+        raise ValueError(f"{sources['students']} has no student_name column")
+
+    tables = pd.read_pickle(os.path.join(data_dir, TABLES))
+    students = pd.Index(_load_array(data_dir, 'students'), name='student_id')
+    courses = pd.Index(_load_array(data_dir, 'courses'), name='course_id')
+    df_students = pd.DataFrame({
+        'student_id': pd.Categorical.from_codes(_load_array(data_dir, 'student_codes'), categories=students,
+                                                validate=False),
+        'course_id': pd.Categorical.from_codes(_load_array(data_dir, 'course_codes'), categories=courses,
+                                               validate=False),
+    })
+    dataset = {
+        **tables,
+        'df_students': df_students,
+        'enrollment': dict(zip(courses, _load_array(data_dir, 'enrollment_counts').tolist())),
+        'students': students,
+        'courses': courses,
+        'student_ptr': _load_array(data_dir, 'student_ptr'),
+        'student_courses': _load_array(data_dir, 'student_courses'),
+        'bundles': (_load_array(data_dir, 'bundle_course_ids').tolist(), _load_array(data_dir, 'bundle_ptr'),
+                    _load_array(data_dir, 'bundle_courses'), _load_array(data_dir, 'bundle_sizes')),
+        'compiled': compiled,
+    }
+    if names:
+        dataset['student_names'] = _load_array(data_dir, 'student_names')
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the input CSVs into the binary dataset bundle")
+    parser.add_argument('--check', action='store_true', help="only report whether the bundle is current")
+    parser.add_argument('--dir', default=DATASET_DIR)
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.dir)
+    try:
+        reason = stale_reason(manifest)
+    except FileNotFoundError as e:
+        print(f"❌ CRITICAL ERROR: Missing file - {e}")
+        sys.exit(1)
+    if args.check:
+        if reason is None:
+            print(f"✅ Dataset in {args.dir} is current (compiled {manifest['compiled_at']}).")
+        else:
+            print(f"⚠️  Dataset in {args.dir} is stale: {reason}.")
+        sys.exit(0 if reason is None else 1)
+
+    t = time.perf_counter()
+    manifest = compile_dataset(data_dir=args.dir)
+    counts = manifest['counts']
+    print(f"✅ Compiled {counts['enrollments']} enrollments ({counts['students']} students, "
+          f"{counts['courses']} courses, {counts['rooms']} rooms, {counts['bundles']} course bundles) "
+          f"into {args.dir} in {time.perf_counter() - t:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
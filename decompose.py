@@ -0,0 +1,269 @@
+import pandas as pd
+import pulp
+import json
+import math
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from formulation import (
+    build_penalty_model, apply_warm_start, assign_rooms, selected_keys, timetable_entries,
+)
+from preprocess import prepare_instance, conflict_components, conflict_neighbours
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+# Objective weights: same meaning and defaults as penalty_model.py
+W1_TIME_PENALTY = 5
+W2_PROF_OVERLOAD = 100
+PROF_DAILY_LIMIT = 2
+
+COMPONENT_TIME_LIMIT = 60   # Per component sub-model
+REPAIR_TIME_LIMIT = 60      # Master room repair
+OUTPUT_FILE = 'timetable_output.json'
+
+# ==========================================
+# Decomposition by conflict-graph components.
+# Courses in different components of the student + instructor conflict
+# graph only interact through rooms. Each component is solved on its own
+# (in parallel, two-stage formulation) against a share of every room-size
+# class; the shares are rounded up, so a master repair step afterwards
+# re-solves only the classes sitting in slots whose rooms are oversubscribed.
+# The repair model holds just those courses and their conflict neighbours
+# (fixed in place); every other course is folded into the room-class rows
+# as rooms already taken. A component that is infeasible under its share
+# is retried with the full room classes, and if that fails too the whole
+# instance is solved as one model.
+# ==========================================
+
+
+def room_class_budgets(instance, components):
+    """
+    Split every room-size class between components in proportion to the
+    classes they need from it. Returns one {frozenset(rooms): limit} per component.
+    """
+    eligible_rooms = instance['eligible_rooms']
+    required = instance['df_courses'].set_index('course_id')['slots_required'].to_dict()
+    classes = {frozenset(rooms) for rooms in eligible_rooms.values() if rooms}
+
+    demand = [{} for _ in components]
+    for i, comp in enumerate(components):
+        for k in classes:
+            demand[i][k] = sum(required[c] for c in comp if eligible_rooms[c] and k.issuperset(eligible_rooms[c]))
+
+    budgets = [{} for _ in components]
+    for k in classes:
+        total = sum(d[k] for d in demand)
+        for i, d in enumerate(demand):
+            if d[k]:
+                budgets[i][k] = max(1, math.ceil(len(k) * d[k] / total))
+    return budgets
+
+
+def solve_component(df_courses, df_rooms, df_students, class_limits, time_limit):
+    """
+    Worker: solve one component with the two-stage penalty model.
+    class_limits=None gives the component every room of each class.
+    Returns (status, chosen (course, slot) pairs); no pairs if no timetable was found.
+    """
+    instance = prepare_instance(df_courses, df_rooms, df_students)
+    prob, model_vars, _ = build_penalty_model(
+        instance, W1_TIME_PENALTY, W2_PROF_OVERLOAD, PROF_DAILY_LIMIT,
+        formulation="two_stage", class_limits=class_limits,
+    )
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, gapRel=0.05))
+    if prob.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        return pulp.LpStatus[prob.status], []
+    chosen = selected_keys(model_vars)
+    return pulp.LpStatus[prob.status], chosen
+
+
+def overbooked_slots(chosen, eligible_rooms, room_capacity):
+    """Slots where the combined components do not fit into the rooms."""
+    by_slot = {}
+    for c, t in chosen:
+        by_slot.setdefault(t, []).append(c)
+    bad = set()
+    for t, slot_courses in by_slot.items():
+        try:
+            assign_rooms(slot_courses, eligible_rooms, room_capacity)
+        except ValueError:
+            bad.add(t)
+    return bad
+
+
+def sub_instance(instance, courses):
+    """The instance restricted to a set of courses (rooms, days and slots unchanged)."""
+    df_courses = instance['df_courses']
+    sub = dict(instance)
+    sub['df_courses'] = df_courses[df_courses['course_id'].isin(courses)]
+    sub['eligible_rooms'] = {c: rooms for c, rooms in instance['eligible_rooms'].items() if c in courses}
+    sub['instructor_map'] = {inst: [c for c in c_list if c in courses]
+                             for inst, c_list in instance['instructor_map'].items()
+                             if any(c in courses for c in c_list)}
+    sub['student_clashes'] = {(c1, c2): n for (c1, c2), n in instance['student_clashes'].items()
+                              if c1 in courses and c2 in courses}
+    return sub
+
+
+def room_class_usage(chosen, outside, eligible_rooms):
+    """{(room class, slot): n} rooms of each class taken by the `outside` courses' classes."""
+    classes = {frozenset(rooms) for rooms in eligible_rooms.values() if rooms}
+    containing = {}
+    usage = {}
+    for c, t in chosen:
+        if c not in outside or not eligible_rooms[c]:
+            continue
+        if c not in containing:
+            containing[c] = [k for k in classes if k.issuperset(eligible_rooms[c])]
+        for k in containing[c]:
+            usage[(k, t)] = usage.get((k, t), 0) + 1
+    return usage
+
+
+def warm_entries(chosen):
+    return [{'Course': c, 'Day': t.split('_')[0], 'Slot': int(t.split('_')[1]), 'Room': None} for c, t in chosen]
+
+
+def solve_full(instance, chosen, time_limit):
+    """Monolithic two-stage solve, warm-started from `chosen`. Returns (prob, chosen pairs)."""
+    prob, model_vars, slot_vars = build_penalty_model(
+        instance, W1_TIME_PENALTY, W2_PROF_OVERLOAD, PROF_DAILY_LIMIT, formulation="two_stage",
+    )
+    apply_warm_start(model_vars, slot_vars, "two_stage", warm_entries(chosen))
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, gapRel=0.05, warmStart=True))
+    if prob.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        return prob, []
+    return prob, selected_keys(model_vars)
+
+
+def repair(instance, chosen, free, time_limit):
+    """
+    Re-solve the `free` courses with their conflict neighbours fixed in place
+    and the remaining courses' classes counted as taken rooms.
+    Returns (prob, chosen pairs for all courses); no pairs if the repair is infeasible.
+    """
+    neighbours = conflict_neighbours(instance)
+    local = set(free).union(*(neighbours[c] for c in free))
+    outside = set(instance['df_courses']['course_id']) - local
+    prob, model_vars, slot_vars = build_penalty_model(
+        sub_instance(instance, local), W1_TIME_PENALTY, W2_PROF_OVERLOAD, PROF_DAILY_LIMIT,
+        formulation="two_stage", name="OptiTime_Repair",
+        slot_usage=room_class_usage(chosen, outside, instance['eligible_rooms']),
+    )
+    apply_warm_start(model_vars, slot_vars, "two_stage", warm_entries((c, t) for c, t in chosen if c in local))
+    for (c, t), var in model_vars.items():
+        if c not in free:
+            var.fixValue()
+    prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, gapRel=0.05, warmStart=True))
+    if prob.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+        return prob, []
+    return prob, [(c, t) for c, t in chosen if c in outside] + selected_keys(model_vars)
+
+
+def room_assignments(chosen, eligible_rooms, room_capacity):
+    """Second stage for combined (course, slot) pairs: a list of (course, slot, room)."""
+    by_slot = {}
+    for c, t in chosen:
+        by_slot.setdefault(t, []).append(c)
+    placement = {t: assign_rooms(slot_courses, eligible_rooms, room_capacity) for t, slot_courses in by_slot.items()}
+    return [(c, t, placement[t][c]) for c, t in chosen]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OptiTime decomposition by conflict-graph components")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="parallel component solves")
+    args = parser.parse_args()
+    t_start = time.time()
+
+    print("Loading Data...")
+    try:
+        df_courses = pd.read_csv('courses.csv')
+        df_students = pd.read_csv('student_data_large.csv')
+        df_rooms = pd.read_csv('rooms.csv')
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        sys.exit(1)
+
+    instance = prepare_instance(df_courses, df_rooms, df_students)
+    components = conflict_components(instance)
+    budgets = room_class_budgets(instance, components)
+    print(f"Decomposed {len(df_courses)} courses into {len(components)} components "
+          f"(largest: {max(len(c) for c in components)} courses).")
+
+    # ==========================================
+    # 1. SOLVE COMPONENTS IN PARALLEL
+    # ==========================================
+    chosen = []
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        def submit(comp, limits):
+            return pool.submit(
+                solve_component,
+                df_courses[df_courses['course_id'].isin(comp)],
+                df_rooms,
+                df_students[df_students['course_id'].isin(comp)],
+                limits,
+                COMPONENT_TIME_LIMIT,
+            )
+
+        futures = [submit(comp, limits) for comp, limits in zip(components, budgets)]
+        for i, (comp, fut) in enumerate(zip(components, futures)):
+            status, comp_chosen = fut.result()
+            print(f"   Component {i} ({len(comp)} courses): {status}")
+            if comp_chosen:
+                chosen.extend(comp_chosen)
+            else:
+                failed.append(i)
+
+        # A component may not fit into its share: retry it with the full room classes
+        if failed:
+            print(f"   {len(failed)} components did not fit their room budget; retrying with all rooms...")
+            retries = {i: submit(components[i], None) for i in failed}
+            failed = []
+            for i, fut in retries.items():
+                status, comp_chosen = fut.result()
+                print(f"   Component {i} ({len(components[i])} courses, all rooms): {status}")
+                if comp_chosen:
+                    chosen.extend(comp_chosen)
+                else:
+                    failed.append(i)
+
+    # ==========================================
+    # 2. MASTER REPAIR
+    # ==========================================
+    if failed:
+        print(f"{len(failed)} components have no timetable of their own; solving the full model instead...")
+        prob, chosen = solve_full(instance, chosen, COMPONENT_TIME_LIMIT + REPAIR_TIME_LIMIT)
+    else:
+        bad_slots = overbooked_slots(chosen, instance['eligible_rooms'], instance['room_capacity'])
+        # Free every course that has a class in an overbooked slot; the rest stays fixed
+        free = {c for c, t in chosen if t in bad_slots}
+        prob = None
+        if free:
+            print(f"Master repair: {len(bad_slots)} overbooked slots, re-solving {len(free)} courses.")
+            prob, repaired = repair(instance, chosen, free, REPAIR_TIME_LIMIT)
+            if not repaired:
+                print("Local repair failed; re-solving the full model from the combined components...")
+                prob, repaired = solve_full(instance, chosen, REPAIR_TIME_LIMIT)
+            chosen = repaired
+    if not chosen:
+        print("No feasible solution found.")
+        sys.exit(1)
+
+    # ==========================================
+    # 3. EXPORT
+    # ==========================================
+    results = timetable_entries(
+        room_assignments(chosen, instance['eligible_rooms'], instance['room_capacity']), df_courses,
+    )
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(results, f, indent=4)
+    objective = f" (Objective of the last solve: {pulp.value(prob.objective)})" if prob is not None else ""
+    print(f"Success! Saved solution in {time.time() - t_start:.1f}s{objective}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import pandas as pd
+import numpy as np
+import json
+import sys
+import argparse
+from preprocess import prepare_instance, clash_graph_from_bundles
+from dataset import load_dataset
+from formulation import late_slot_weights, timetable_entries
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+# Objective weights: same meaning and defaults as penalty_model.py
+W1_TIME_PENALTY = 5
+W2_PROF_OVERLOAD = 100
+PROF_DAILY_LIMIT = 2
+TIMETABLE_FILE = 'timetable_output.json'
+
+# ==========================================
+# Incremental (delta) validation.
+# The state keeps occupancy counters for every check of validate.py and
+# the hard constraints of the models:
+#   busy[student, slot]       classes a student attends at a slot
+#   room_busy[room, slot]     classes in a room at a slot
+#   inst_busy[inst, slot]     classes an instructor teaches at a slot
+#   inst_day[inst, day]       daily workload (soft, > PROF_DAILY_LIMIT is penalised)
+#   course_busy[course, slot] classes of a course at a slot
+# Violations are counted as excess over 1 (e.g. a student with three
+# classes at Mon_2 is 2 student clashes). Moving or swapping classes only
+# touches the counters of the affected students, rooms and instructors,
+# so evaluate_move() / evaluate_swap() cost O(affected students).
+# ==========================================
+
+VIOLATIONS = ('student_clashes', 'room_conflicts', 'instructor_conflicts', 'course_double_booked',
+              'ineligible_rooms', 'slot_requirements')
+
+
+def build_delta_state(instance, entries, w_time=W1_TIME_PENALTY, w_overload=W2_PROF_OVERLOAD,
+                      daily_limit=PROF_DAILY_LIMIT):
+    """Counters, violations and objective for a timetable (list of JSON entries)."""
+    df_courses = instance['df_courses']
+    df_students = instance['df_students']
+    time_slots = instance['time_slots']
+    days = instance['days']
+
+    course_ids = df_courses['course_id'].tolist()
+    course_idx = {c: i for i, c in enumerate(course_ids)}
+    slot_idx = {t: i for i, t in enumerate(time_slots)}
+    rooms = list(instance['room_capacity'])
+    room_idx = {r: i for i, r in enumerate(rooms)}
+    instructors = list(instance['instructor_map'])
+    inst_idx = {inst: i for i, inst in enumerate(instructors)}
+
+    # Unique student indices per course (duplicate enrollment rows count once)
+    student_codes, _ = pd.factorize(df_students['student_id'])
+    enrolled = pd.DataFrame({'s': student_codes, 'c': df_students['course_id'].values}).drop_duplicates()
+    students_of = {c: np.array(g['s'].values, dtype=np.int64) for c, g in enrolled.groupby('c', observed=True)}
+    n_students = int(student_codes.max()) + 1 if len(student_codes) else 0
+
+    instructors_of = {}
+    for inst, c_list in instance['instructor_map'].items():
+        for c in c_list:
+            instructors_of.setdefault(c, []).append(inst_idx[inst])
+    overload_tracked = np.array([inst != 'TBD' for inst in instructors], dtype=bool)
+
+    weights = late_slot_weights(time_slots, w_time)
+    state = {
+        'course_idx': course_idx, 'slot_idx': slot_idx, 'room_idx': room_idx,
+        'time_slots': time_slots, 'rooms': rooms,
+        'slot_day': np.array([days.index(t.split('_')[0]) for t in time_slots]),
+        'slot_weight': np.array([weights[t] for t in time_slots], dtype=float),
+        'students_of': students_of,
+        'instructors_of': instructors_of,
+        'overload_tracked': overload_tracked,
+        'eligible': {c: {room_idx[r] for r in instance['eligible_rooms'].get(c, []) if r in room_idx}
+                     for c in course_ids},
+        'required': df_courses.set_index('course_id')['slots_required'].to_dict(),
+        'w_overload': w_overload,
+        'daily_limit': daily_limit,
+        'busy': np.zeros((n_students, len(time_slots)), dtype=np.int16),
+        'room_busy': np.zeros((len(rooms), len(time_slots)), dtype=np.int16),
+        'inst_busy': np.zeros((len(instructors), len(time_slots)), dtype=np.int16),
+        'inst_day': np.zeros((len(instructors), len(days)), dtype=np.int16),
+        'course_busy': np.zeros((len(course_ids), len(time_slots)), dtype=np.int16),
+        'placements': {},   # (course, slot) -> [room, ...] (more than one: double-booked; [] after a move away)
+        'violations': dict.fromkeys(VIOLATIONS, 0),
+        'objective': 0.0,
+    }
+
+    counts = {}
+    for e in entries:
+        c, t = e['Course'], f"{e['Day']}_{e['Slot']}"
+        _place(state, c, t, e['Room'], +1)
+        state['placements'].setdefault((c, t), []).append(e['Room'])
+        counts[c] = counts.get(c, 0) + 1
+    state['violations']['slot_requirements'] = sum(
+        1 for c, h in state['required'].items() if counts.get(c, 0) != h
+    )
+    return state
+
+
+def _place(state, course, slot, room, sign):
+    """
+    Add (sign=+1) or remove (sign=-1) one class and update every counter.
+    Returns ({violation: delta}, objective delta).
+    """
+    t = state['slot_idx'][slot]
+    r = state['room_idx'].get(room)
+    delta = dict.fromkeys(VIOLATIONS, 0)
+    # Excess over 1 changes when the count before an add (after a remove) is >= 1
+    threshold = 1 if sign > 0 else 2
+
+    idx = state['students_of'].get(course)
+    if idx is not None and len(idx):
+        col = state['busy'][idx, t]
+        delta['student_clashes'] += sign * int((col >= threshold).sum())
+        state['busy'][idx, t] = col + sign
+
+    if r is not None:
+        delta['room_conflicts'] += sign * int(state['room_busy'][r, t] >= threshold)
+        state['room_busy'][r, t] += sign
+    if r is None or r not in state['eligible'].get(course, ()):
+        delta['ineligible_rooms'] += sign
+
+    ci = state['course_idx'].get(course)
+    if ci is not None:
+        delta['course_double_booked'] += sign * int(state['course_busy'][ci, t] >= threshold)
+        state['course_busy'][ci, t] += sign
+
+    objective = sign * state['slot_weight'][t]
+    d = state['slot_day'][t]
+    for i in state['instructors_of'].get(course, []):
+        delta['instructor_conflicts'] += sign * int(state['inst_busy'][i, t] >= threshold)
+        state['inst_busy'][i, t] += sign
+        # Daily workload excess over the limit grows when the load before an add is >= limit
+        load = state['inst_day'][i, d]
+        if state['overload_tracked'][i] and (load >= state['daily_limit'] if sign > 0 else load > state['daily_limit']):
+            objective += sign * state['w_overload']
+        state['inst_day'][i, d] += sign
+
+    for k, v in delta.items():
+        state['violations'][k] += v
+    state['objective'] += objective
+    return delta, objective
+
+
+def _relocate(state, changes):
+    """
+    Apply [(course, old_slot, old_room, new_slot, new_room)] together: all
+    classes are removed first, then re-added. Emptied placements stay as []
+    so the key order is kept. Returns the summed violation deltas, the
+    objective delta and the steps for _undo().
+    """
+    placements = state['placements']
+    total = dict.fromkeys(VIOLATIONS, 0)
+    objective = 0.0
+    steps = []
+    for c, old_t, old_r, new_t, new_r in changes:
+        rooms = placements[(c, old_t)]
+        i = rooms.index(old_r)
+        del rooms[i]
+        steps.append((c, old_t, i, old_r, new_t, new_r))
+    for c, old_t, _, old_r, _, _ in steps:
+        d, o = _place(state, c, old_t, old_r, -1)
+        objective += o
+        for k, v in d.items(): total[k] += v
+    undo = []
+    for c, old_t, i, old_r, new_t, new_r in steps:
+        d, o = _place(state, c, new_t, new_r, +1)
+        created = (c, new_t) not in placements
+        placements.setdefault((c, new_t), []).append(new_r)
+        undo.append((c, old_t, i, old_r, new_t, new_r, created))
+        objective += o
+        for k, v in d.items(): total[k] += v
+    return total, objective, undo
+
+
+def _undo(state, undo):
+    """Exact inverse of _relocate(): counters, placements and their order are restored."""
+    placements = state['placements']
+    for c, _, _, _, new_t, new_r, created in reversed(undo):
+        placements[(c, new_t)].pop()
+        if created:
+            del placements[(c, new_t)]   # created last, so the key order is as before
+        _place(state, c, new_t, new_r, -1)
+    for c, old_t, i, old_r, _, _, _ in reversed(undo):
+        placements[(c, old_t)].insert(i, old_r)
+        _place(state, c, old_t, old_r, +1)
+
+
+def _evaluate(state, changes):
+    """Apply, read the result, undo; checks that the touched placements came back unchanged."""
+    keys = {(c, t) for c, old_t, _, new_t, _ in changes for t in (old_t, new_t)}
+    before = (len(state['placements']), {k: list(state['placements'][k]) for k in keys if k in state['placements']})
+    delta, objective, undo = _relocate(state, changes)
+    try:
+        result = _result(state, delta, objective)
+    finally:
+        _undo(state, undo)
+    after = (len(state['placements']), {k: list(state['placements'][k]) for k in keys if k in state['placements']})
+    if after != before:
+        raise RuntimeError(f"evaluation changed the placements: {before} -> {after}")
+    return result
+
+
+def _result(state, delta, objective):
+    return {
+        'feasible': not any(state['violations'].values()),
+        'violations_delta': {k: v for k, v in delta.items() if v},
+        'objective_delta': objective,
+        'violations': dict(state['violations']),
+        'objective': state['objective'],
+    }
+
+
+def _room_of(state, course, slot):
+    """Room of the course's class at slot (the one placed last, if it is double-booked)."""
+    rooms = state['placements'].get((course, slot))
+    if not rooms:
+        raise KeyError(f"{course} has no class at {slot}")
+    return rooms[-1]
+
+
+def _move_changes(state, course, from_slot, to_slot, to_room):
+    from_room = _room_of(state, course, from_slot)
+    if to_slot not in state['slot_idx']:
+        raise KeyError(f"Unknown time slot {to_slot}")
+    return [(course, from_slot, from_room, to_slot, to_room if to_room is not None else from_room)]
+
+
+def _swap_changes(state, course_a, slot_a, course_b, slot_b):
+    """The two classes exchange time slot and room."""
+    room_a = _room_of(state, course_a, slot_a)
+    room_b = _room_of(state, course_b, slot_b)
+    return [(course_a, slot_a, room_a, slot_b, room_b), (course_b, slot_b, room_b, slot_a, room_a)]
+
+
+def evaluate_move(state, course, from_slot, to_slot, to_room=None):
+    """
+    Feasibility and objective delta of moving one class of `course` from
+    from_slot to to_slot (and to_room; default: keep its room). The state is
+    left unchanged. Returns {feasible, violations_delta, objective_delta, violations, objective}
+    where violations/objective describe the timetable *after* the move.
+    """
+    return _evaluate(state, _move_changes(state, course, from_slot, to_slot, to_room))
+
+
+def apply_move(state, course, from_slot, to_slot, to_room=None):
+    delta, objective, _ = _relocate(state, _move_changes(state, course, from_slot, to_slot, to_room))
+    return _result(state, delta, objective)
+
+
+def evaluate_swap(state, course_a, slot_a, course_b, slot_b):
+    """Like evaluate_move() for two classes exchanging their time slots and rooms."""
+    return _evaluate(state, _swap_changes(state, course_a, slot_a, course_b, slot_b))
+
+
+def apply_swap(state, course_a, slot_a, course_b, slot_b):
+    delta, objective, _ = _relocate(state, _swap_changes(state, course_a, slot_a, course_b, slot_b))
+    return _result(state, delta, objective)
+
+
+def state_entries(state, df_courses):
+    """Current timetable as standard JSON entries."""
+    return timetable_entries([(c, t, r) for (c, t), rooms in state['placements'].items() for r in rooms], df_courses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate (and optionally apply) a manual timetable edit")
+    parser.add_argument('--timetable', default=TIMETABLE_FILE)
+    edit = parser.add_mutually_exclusive_group(required=True)
+    edit.add_argument('--move', nargs='+', metavar='ARG', help="COURSE FROM_SLOT TO_SLOT [ROOM], slots as Mon_2")
+    edit.add_argument('--swap', nargs=4, metavar=('COURSE_A', 'SLOT_A', 'COURSE_B', 'SLOT_B'))
+    parser.add_argument('--apply', action='store_true', help="write the edited timetable back")
+    args = parser.parse_args()
+    if args.move and len(args.move) not in (3, 4):
+        parser.error("--move takes COURSE FROM_SLOT TO_SLOT [ROOM]")
+
+    try:
+        # Courses, rooms and enrollments from the binary dataset (compiled from the CSVs when they changed)
+        dataset = load_dataset()
+        with open(args.timetable, 'r') as f:
+            entries = json.load(f)
+    except FileNotFoundError as e:
+        print(f"❌ CRITICAL ERROR: Missing file - {e}")
+        sys.exit(1)
+
+    df_courses = dataset['df_courses']
+    instance = prepare_instance(
+        df_courses, dataset['df_rooms'], dataset['df_students'],
+        enrollment=dataset['enrollment'], student_clashes=clash_graph_from_bundles(*dataset['bundles']),
+    )
+    state = build_delta_state(instance, entries)
+    print(f"Current timetable: objective {state['objective']:g}, violations {state['violations']}")
+
+    try:
+        if args.move:
+            result = (apply_move if args.apply else evaluate_move)(state, *args.move)
+        else:
+            result = (apply_swap if args.apply else evaluate_swap)(state, *args.swap)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        sys.exit(1)
+
+    verdict = "✅ FEASIBLE" if result['feasible'] else "❌ INFEASIBLE"
+    print(f"{verdict}: objective {result['objective_delta']:+g} (-> {result['objective']:g}), "
+          f"violation changes {result['violations_delta'] or 'none'}")
+    if args.apply:
+        with open(args.timetable, 'w') as f:
+            json.dump(state_entries(state, df_courses), f, indent=4)
+        print(f"Saved edited timetable to {args.timetable}")
+
+
+if __name__ == "__main__":
+    main()
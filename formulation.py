@@ -0,0 +1,388 @@
+import warnings
+import numpy as np
+import pulp
+from preprocess import clash_cliques, pool_eligibility
+from instrumentation import phase
+
+# ==========================================
+# SHARED MODEL BUILDING BLOCKS
+# ==========================================
+# Constraint families used by both new_model.py and penalty_model.py.
+# slot_vars maps (course, time_slot) -> list of binaries that put the
+# course at that slot: one per eligible room in the time+room formulation,
+# a single y[c, t] in the two-stage formulation.
+#
+# FORMULATIONS
+#   "time_room": x[c, t, r] binaries, room conflicts enforced directly.
+#   "two_stage": y[c, t] binaries + aggregate room-class capacity rows;
+#                rooms are assigned per slot after the solve (assign_rooms).
+FORMULATIONS = ("time_room", "two_stage")
+
+# ROOM SYMMETRY (time_room only; identical rooms = same capacity + lab flag)
+#   "pool": one counted resource per pool of identical rooms, x[c, t, pool]
+#   "lex":  keep x[c, t, r] and order identical rooms lexicographically
+#   "none": plain x[c, t, r]
+ROOM_SYMMETRY_MODES = ("pool", "lex", "none")
+
+# Binary values within this distance of 0/1 are taken as integral when decoding
+INTEGRALITY_TOL = 1e-5
+
+
+def create_room_variables(course_ids, eligible_rooms, time_slots):
+    """x[c, t, r] = 1 if course c is at time t in room r."""
+    x = {}
+    for c in course_ids:
+        for t in time_slots:
+            for r in eligible_rooms[c]:
+                x[(c, t, r)] = pulp.LpVariable(f"x_{c}_{t}_{r}", cat='Binary')
+    return x
+
+
+def create_slot_variables(course_ids, eligible_rooms, time_slots):
+    """y[c, t] = 1 if course c is at time t (room decided later)."""
+    y = {}
+    for c in course_ids:
+        if not eligible_rooms[c]:
+            continue
+        for t in time_slots:
+            y[(c, t)] = pulp.LpVariable(f"y_{c}_{t}", cat='Binary')
+    return y
+
+
+def course_slot_vars(x):
+    """Group x[c, t, r] by (c, t)."""
+    slot_vars = {}
+    for (c, t, r), var in x.items():
+        slot_vars.setdefault((c, t), []).append(var)
+    return slot_vars
+
+
+def add_slot_requirements(prob, slot_vars, df_courses, time_slots):
+    """Each course must be scheduled exactly slots_required times."""
+    for c, required in df_courses[['course_id', 'slots_required']].itertuples(index=False):
+        prob += pulp.lpSum(v for t in time_slots for v in slot_vars.get((c, t), [])) == required, f"Req_Slots_{c}"
+
+
+def add_room_conflicts(prob, x, time_slots, room_counts=None):
+    """
+    Max 1 course per room per time slot (time+room formulation).
+    With pooled rooms, room_counts gives the number of rooms behind each pool.
+    """
+    room_counts = room_counts or {}
+    room_vars = {}
+    for (c, t, r), var in x.items():
+        room_vars.setdefault((r, t), []).append(var)
+    for (r, t), vs in room_vars.items():
+        limit = room_counts.get(r, 1)
+        if len(vs) > limit:
+            prob += pulp.lpSum(vs) <= limit, f"Room_Conflict_{r}_{t}"
+
+
+def add_room_symmetry_breaking(prob, x, room_pools, time_slots):
+    """
+    Lexicographic symmetry breaking between identical rooms: within a pool
+    [r1, r2, ...], r2 may only be used at a slot if r1 is used too, etc.
+    """
+    usage = {}
+    for (c, t, r), var in x.items():
+        usage.setdefault((r, t), []).append(var)
+    for members in room_pools.values():
+        for r_hi, r_lo in zip(members, members[1:]):
+            for t in time_slots:
+                if (r_lo, t) in usage:
+                    prob += pulp.lpSum(usage.get((r_hi, t), [])) >= pulp.lpSum(usage[(r_lo, t)]), f"Room_Sym_{r_lo}_{t}"
+
+
+def add_room_class_capacity(prob, slot_vars, eligible_rooms, time_slots, class_limits=None, slot_usage=None):
+    """
+    Aggregate room capacity rows for the two-stage formulation.
+
+    Every distinct eligible-room set is a room-size class. At each slot the
+    courses whose eligible rooms all lie inside a class may not outnumber
+    the rooms in that class. Because eligibility is 'capacity >= enrollment'
+    within a room type, the classes are nested and these rows are exactly
+    Hall's condition, so assign_rooms() always finds a room for every course.
+
+    class_limits {frozenset(rooms): n} lowers the limit of a class below its
+    room count (used to give each decomposed component a room budget).
+    slot_usage {(frozenset(rooms), slot): n} counts rooms of a class already
+    taken at a slot by courses outside the model (decompose.py's repair step).
+    """
+    class_limits = class_limits or {}
+    slot_usage = slot_usage or {}
+    classes = {frozenset(rooms) for rooms in eligible_rooms.values() if rooms} | {k for k, _ in slot_usage}
+    used = {}
+    for (k, _), n in slot_usage.items():
+        used[k] = max(used.get(k, 0), n)
+    for k_idx, room_class in enumerate(sorted(classes, key=lambda k: (len(k), sorted(k)))):
+        members = [c for c, rooms in eligible_rooms.items() if rooms and room_class.issuperset(rooms)]
+        limit = class_limits.get(room_class, len(room_class))
+        if not members or len(members) <= limit - used.get(room_class, 0):
+            continue
+        for t in time_slots:
+            prob += (pulp.lpSum(v for c in members for v in slot_vars.get((c, t), []))
+                     <= limit - slot_usage.get((room_class, t), 0)), f"Room_Class_{k_idx}_{t}"
+
+
+def add_instructor_conflicts(prob, slot_vars, instructor_map, time_slots):
+    """Max 1 course per instructor per time slot."""
+    for inst, c_list in instructor_map.items():
+        for t in time_slots:
+            vs = [v for c in c_list for v in slot_vars.get((c, t), [])]
+            if len(vs) > 1:
+                prob += pulp.lpSum(vs) <= 1, f"Inst_Conflict_{inst}_{t}"
+
+
+def add_student_clash_constraints(prob, slot_vars, student_clashes, time_slots, mode="clique"):
+    """
+    Forbid courses that share students from running at the same time.
+
+    mode="pairwise": one row per clashing pair per slot.
+    mode="clique":   cover the clash graph with maximal cliques and add one
+                     'sum over clique <= 1' row per clique per slot. Far fewer
+                     rows and a tighter LP relaxation than the pairwise form.
+    Returns the number of rows added.
+    """
+    if mode == "pairwise":
+        groups = [list(pair) for pair in student_clashes]
+        prefix = "Stud_Clash"
+    elif mode == "clique":
+        groups = clash_cliques(student_clashes)
+        prefix = "Stud_Clique"
+    else:
+        raise ValueError(f"Unknown student clash mode: {mode}")
+
+    rows = 0
+    for g_idx, group in enumerate(groups):
+        label = "_".join(group) if mode == "pairwise" else str(g_idx)
+        for t in time_slots:
+            # Only add the row if at least two courses *could* be scheduled at t
+            members = [slot_vars[(c, t)] for c in group if (c, t) in slot_vars]
+            if len(members) < 2:
+                continue
+            prob += pulp.lpSum(v for vs in members for v in vs) <= 1, f"{prefix}_{label}_{t}"
+            rows += 1
+    return rows
+
+
+def add_prof_overload(prob, slot_vars, instructor_map, days, time_slots, daily_limit):
+    """
+    Soft daily workload limit: daily_load <= daily_limit + excess.
+    Returns the list of excess variables to be penalised in the objective.
+    """
+    overload_vars = []
+    for inst, c_list in instructor_map.items():
+        if inst == 'TBD': continue
+        for d in days:
+            day_slots = [s for s in time_slots if s.startswith(d)]
+            daily_load = pulp.lpSum(v for c in c_list for t in day_slots for v in slot_vars.get((c, t), []))
+            excess = pulp.LpVariable(f"excess_{inst}_{d}", lowBound=0)
+            prob += daily_load <= daily_limit + excess, f"Prof_Daily_{inst}_{d}"
+            overload_vars.append(excess)
+    return overload_vars
+
+
+def build_hard_constraints(prob, df_courses, eligible_rooms, room_pools, instructor_map, student_clashes,
+                           time_slots, formulation="time_room", room_symmetry="pool", clash_mode="clique",
+                           class_limits=None, slot_usage=None, metrics=None):
+    """
+    Create the decision variables and every hard constraint family.
+    Returns (model_vars, slot_vars); pass model_vars to solution_assignments().
+    class_limits and slot_usage only apply to the two-stage formulation (see add_room_class_capacity).
+    metrics: optional instrumentation handle; each family is recorded as its own phase.
+    """
+    course_ids = df_courses['course_id'].tolist()
+
+    # --- VARIABLES ---
+    with phase(metrics, "variables") as rec:
+        if formulation == "two_stage":
+            model_vars = create_slot_variables(course_ids, eligible_rooms, time_slots)
+            slot_vars = {key: [var] for key, var in model_vars.items()}
+        elif formulation == "time_room":
+            var_rooms = pool_eligibility(eligible_rooms, room_pools) if room_symmetry == "pool" else eligible_rooms
+            model_vars = create_room_variables(course_ids, var_rooms, time_slots)
+            slot_vars = course_slot_vars(model_vars)
+        else:
+            raise ValueError(f"Unknown formulation: {formulation}")
+        rec['variables'] = len(model_vars)
+
+    # --- CONSTRAINTS ---
+    with phase(metrics, "constraints.slot_requirements", prob):
+        add_slot_requirements(prob, slot_vars, df_courses, time_slots)
+
+    if formulation == "two_stage":
+        with phase(metrics, "constraints.room_class_capacity", prob):
+            add_room_class_capacity(prob, slot_vars, eligible_rooms, time_slots, class_limits, slot_usage)
+    elif room_symmetry == "pool":
+        with phase(metrics, "constraints.room_conflicts", prob):
+            add_room_conflicts(prob, model_vars, time_slots, {rep: len(m) for rep, m in room_pools.items()})
+    else:
+        with phase(metrics, "constraints.room_conflicts", prob):
+            add_room_conflicts(prob, model_vars, time_slots)
+        if room_symmetry == "lex":
+            with phase(metrics, "constraints.room_symmetry", prob):
+                add_room_symmetry_breaking(prob, model_vars, room_pools, time_slots)
+
+    with phase(metrics, "constraints.instructor_conflicts", prob):
+        add_instructor_conflicts(prob, slot_vars, instructor_map, time_slots)
+    with phase(metrics, "constraints.student_clashes", prob):
+        add_student_clash_constraints(prob, slot_vars, student_clashes, time_slots, mode=clash_mode)
+    return model_vars, slot_vars
+
+
+def apply_warm_start(model_vars, slot_vars, formulation, entries, room_pools=None):
+    """
+    Map an existing timetable (list of JSON entries with Course/Day/Slot/Room)
+    onto the model as initial values for a MIP start.
+
+    Entries whose room is no longer eligible fall back to another free room
+    option for the same course and slot. Returns the number of entries mapped.
+    """
+    rep_of = {r: rep for rep, members in room_pools.items() for r in members} if room_pools else {}
+    for var in model_vars.values():
+        var.setInitialValue(0)
+
+    mapped = 0
+    for e in entries:
+        c, t, r = e['Course'], f"{e['Day']}_{e['Slot']}", e['Room']
+        if formulation == "two_stage":
+            preferred = model_vars.get((c, t))
+        else:
+            preferred = model_vars.get((c, t, rep_of.get(r, r)))
+        candidates = [preferred] + slot_vars.get((c, t), [])
+        var = next((v for v in candidates if v is not None and v.varValue == 0), None)
+        if var is not None:
+            var.setInitialValue(1)
+            mapped += 1
+    return mapped
+
+
+def late_slot_weights(time_slots, w_time):
+    """Penalty per class for each slot: 0 for the first slot of the day, +w_time per later slot."""
+    return {t: (int(t.split('_')[1]) - 1) * w_time for t in time_slots}
+
+
+def late_slot_term(slot_vars, slot_weights):
+    return pulp.lpSum(v * slot_weights[t] for (c, t), vs in slot_vars.items() for v in vs)
+
+
+def build_penalty_model(instance, w_time, w_overload, daily_limit, formulation="time_room",
+                        room_symmetry="pool", clash_mode="clique", name="OptiTime_Advanced", class_limits=None,
+                        slot_usage=None):
+    """
+    The penalty_model.py formulation as a function: hard constraints plus
+    late-slot and professor-overload objective.
+    Returns (prob, model_vars, slot_vars).
+    """
+    prob = pulp.LpProblem(name, pulp.LpMinimize)
+    model_vars, slot_vars = build_hard_constraints(
+        prob, instance['df_courses'], instance['eligible_rooms'], instance['room_pools'],
+        instance['instructor_map'], instance['student_clashes'], instance['time_slots'],
+        formulation=formulation, room_symmetry=room_symmetry, clash_mode=clash_mode, class_limits=class_limits,
+        slot_usage=slot_usage,
+    )
+    obj_time = late_slot_term(slot_vars, late_slot_weights(instance['time_slots'], w_time))
+    overload_vars = add_prof_overload(
+        prob, slot_vars, instance['instructor_map'], instance['days'], instance['time_slots'], daily_limit
+    )
+    prob += obj_time + (w_overload * pulp.lpSum(overload_vars))
+    return prob, model_vars, slot_vars
+
+
+# ==========================================
+# SOLUTION DECODING
+# ==========================================
+def assign_rooms(slot_courses, eligible_rooms, room_capacity):
+    """
+    Second stage of the two-stage formulation: give each course at a slot a room.
+
+    slot_courses: list of course ids scheduled at one slot.
+    Courses are placed most-constrained first, each into the smallest free
+    eligible room. Returns {course: room}; raises ValueError if a course
+    cannot be placed (only possible if the class capacity rows were skipped).
+    """
+    taken = set()
+    placement = {}
+    for c in sorted(slot_courses, key=lambda c: (len(eligible_rooms[c]), c)):
+        free = [r for r in eligible_rooms[c] if r not in taken]
+        if not free:
+            raise ValueError(f"No free room for course {c}")
+        room = min(free, key=lambda r: (room_capacity[r], r))
+        placement[c] = room
+        taken.add(room)
+    return placement
+
+
+def expand_room_pools(assignments, room_pools, preferred_rooms=None):
+    """
+    Map pooled (course, slot, pool) assignments onto the concrete rooms of each pool.
+    preferred_rooms {(course, slot): room} keeps a class in its previous room when
+    that room is still free in the pool.
+    """
+    preferred_rooms = preferred_rooms or {}
+    taken = set()
+    placement = {}
+    for c, t, rep in assignments:
+        room = preferred_rooms.get((c, t))
+        if room in room_pools[rep] and (t, room) not in taken:
+            placement[(c, t)] = room
+            taken.add((t, room))
+    expanded = []
+    for c, t, rep in assignments:
+        if (c, t) not in placement:
+            room = next(r for r in room_pools[rep] if (t, r) not in taken)
+            placement[(c, t)] = room
+            taken.add((t, room))
+        expanded.append((c, t, placement[(c, t)]))
+    return expanded
+
+
+def selected_keys(model_vars, tol=INTEGRALITY_TOL, values=None):
+    """
+    Keys of the binaries set to 1, with all values read in one pass.
+    Values are rounded at 0.5; any value further than tol from 0/1 is reported.
+    values: {variable name: value} read from a solution file, instead of varValue.
+    """
+    keys = list(model_vars)
+    if values is None:
+        read = (v.varValue if v.varValue is not None else 0.0 for v in model_vars.values())
+    else:
+        read = (values.get(v.name, 0.0) for v in model_vars.values())
+    values = np.fromiter(read, dtype=float, count=len(keys))
+    fractional = np.count_nonzero((values > tol) & (values < 1 - tol))
+    if fractional:
+        warnings.warn(f"{fractional} binaries are more than {tol} away from 0/1; rounding at 0.5")
+    return [keys[i] for i in np.flatnonzero(values > 0.5)]
+
+
+def solution_assignments(model_vars, formulation, eligible_rooms, room_capacity, room_pools=None,
+                         previous_entries=None, values=None):
+    """
+    Return the solved timetable as a list of (course, time_slot, room).
+    room_pools must be given when the time_room model was built with pooled rooms;
+    previous_entries (an earlier timetable) keeps classes in their old room where possible.
+    values: see selected_keys().
+    """
+    if formulation == "time_room":
+        chosen = selected_keys(model_vars, values=values)
+        if not room_pools:
+            return chosen
+        preferred = {(e['Course'], f"{e['Day']}_{e['Slot']}"): e['Room'] for e in previous_entries or []}
+        return expand_room_pools(chosen, room_pools, preferred)
+
+    chosen = selected_keys(model_vars, values=values)
+    by_slot = {}
+    for c, t in chosen:
+        by_slot.setdefault(t, []).append(c)
+    placement = {t: assign_rooms(slot_courses, eligible_rooms, room_capacity) for t, slot_courses in by_slot.items()}
+    return [(c, t, placement[t][c]) for c, t in chosen]
+
+
+def timetable_entries(assignments, df_courses):
+    """Standard timetable JSON entries for a list of (course, time_slot, room)."""
+    titles = df_courses.set_index('course_id')['title'].to_dict()
+    entries = []
+    for c, t, r in assignments:
+        day, slot_num = t.split('_')
+        entries.append({'Day': day, 'Slot': int(slot_num), 'Course': c, 'Room': r, 'Title': titles.get(c, c)})
+    return entries
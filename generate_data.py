@@ -3,18 +3,25 @@
 #  - student_data_large.csv
 #  - courses.csv
 #  - rooms.csv
+#
+# `python generate_data.py` writes the built-in cohort model below.
+# `python generate_data.py synthetic ...` instead generates a parameterised
+# instance (cohorts, electives, instructor load, room sizes) of any size;
+# benchmark.py builds its instances of increasing size with it
+# (write_synthetic_instance).
+# Enrollment rows are streamed to CSV in chunks, so memory stays bounded
+# by the number of courses, not the number of rows.
 
 
+import argparse
 import csv
+import math
 import random
+from itertools import islice
 from pathlib import Path
 
 OUT = Path('.')  
-
-# -------------------------
-# Student data generation
-# -------------------------
-filename = OUT / "student_data_large.csv"
+CHUNK_SIZE = 100_000   # Enrollment rows buffered per CSV write
 
 first_names = [
     "Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Ayan", "Krishna",
@@ -26,50 +33,14 @@ last_names = [
     "Malhotra", "Bhat", "Saxena", "Deshmukh", "Jha", "Kaur", "Rao", "Joshi", "Das"
 ]
 
-def get_random_name():
-    return f"{random.choice(first_names)} {random.choice(last_names)}"
+def get_random_name(rng=random):
+    return f"{rng.choice(first_names)} {rng.choice(last_names)}"
 
 # Course groups
 group_a_courses = ["C1", "C2", "C3", "C17"]    # 60 students, exact same courses
 group_b_courses = ["C4", "C5", "C6"]           # 30 students, exact same courses
 elective_pool = ["C7", "C8", "C9", "C10", "C11", "C12", "C13", "C14", "C15", "C16"]
 
-data_rows = []
-
-# GENERATE GROUP A (60 Students - High Overlap)
-# IDs: BT202501001 ... BT202501060
-for i in range(1, 61):
-    student_id = f"BT202501{i:03d}"
-    name = get_random_name()
-    for course in group_a_courses:
-        data_rows.append([student_id, name, course])
-
-# GENERATE GROUP B (30 Students - Medium Overlap)
-# IDs: IMT202501001 ... IMT202501030
-for i in range(1, 31):
-    student_id = f"IMT202501{i:03d}"
-    name = get_random_name()
-    for course in group_b_courses:
-        data_rows.append([student_id, name, course])
-
-# GENERATE GROUP C (20 Students - Random/No Overlap)
-# IDs: BT202502001 ... BT202502020
-for i in range(1, 21):
-    student_id = f"BT202502{i:03d}"
-    name = get_random_name()
-    num_courses = random.randint(3, 4)
-    random_courses = random.sample(elective_pool, num_courses)
-    for course in random_courses:
-        data_rows.append([student_id, name, course])
-
-# Write student CSV
-with open(filename, 'w', newline='', encoding='utf-8') as f:
-    writer = csv.writer(f)
-    writer.writerow(["student_id", "student_name", "course_id"])
-    writer.writerows(data_rows)
-
-print(f"Successfully generated {len(data_rows)} rows in '{filename.name}'")
-
 # -------------------------
 # Courses and Rooms files
 # -------------------------
@@ -106,16 +77,247 @@ rooms = [
     ("R-108",120)
 ]
 
-# courses.csv
-with open(OUT / 'courses.csv','w', newline='', encoding='utf8') as f:
-    writer = csv.writer(f)
-    writer.writerow(['course_id','title','credits','instructor1','instructor2','room','batches','slots_required'])
-    writer.writerows(courses)
+# -------------------------
+# CSV writing
+# -------------------------
+STUDENT_HEADER = ["student_id", "student_name", "course_id"]
+COURSE_HEADER = ['course_id','title','credits','instructor1','instructor2','room','batches','slots_required']
+ROOM_HEADER = ['room','capacity']
+
+
+def write_csv(path, header, rows, chunk_size=CHUNK_SIZE):
+    """Write an iterable of rows in chunks of chunk_size. Returns the row count."""
+    n_rows = 0
+    rows = iter(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            n_rows += len(chunk)
+    return n_rows
+
+
+# -------------------------
+# Student data generation
+# -------------------------
+def student_rows(rng=random):
+    """Enrollment rows [student_id, name, course_id] of the three student groups."""
+    data_rows = []
+
+    # GENERATE GROUP A (60 Students - High Overlap)
+    # IDs: BT202501001 ... BT202501060
+    for i in range(1, 61):
+        student_id = f"BT202501{i:03d}"
+        name = get_random_name(rng)
+        for course in group_a_courses:
+            data_rows.append([student_id, name, course])
+
+    # GENERATE GROUP B (30 Students - Medium Overlap)
+    # IDs: IMT202501001 ... IMT202501030
+    for i in range(1, 31):
+        student_id = f"IMT202501{i:03d}"
+        name = get_random_name(rng)
+        for course in group_b_courses:
+            data_rows.append([student_id, name, course])
+
+    # GENERATE GROUP C (20 Students - Random/No Overlap)
+    # IDs: BT202502001 ... BT202502020
+    for i in range(1, 21):
+        student_id = f"BT202502{i:03d}"
+        name = get_random_name(rng)
+        num_courses = rng.randint(3, 4)
+        random_courses = rng.sample(elective_pool, num_courses)
+        for course in random_courses:
+            data_rows.append([student_id, name, course])
+
+    return data_rows
+
+
+def write_instance(out_dir=OUT, seed=None, chunk_size=CHUNK_SIZE):
+    """Write the three CSVs of the built-in cohort model to out_dir."""
+    out_dir = Path(out_dir)
+    rng = random.Random(seed)
+    n_rows = write_csv(out_dir / "student_data_large.csv", STUDENT_HEADER, student_rows(rng), chunk_size)
+    write_csv(out_dir / 'courses.csv', COURSE_HEADER, courses)
+    write_csv(out_dir / 'rooms.csv', ROOM_HEADER, rooms)
+    return n_rows
+
+
+# -------------------------
+# Parameterised (synthetic) instances
+# -------------------------
+# Each cohort (programme + intake) has its own core courses that all its
+# students take, plus an elective track. A student's electives come from the
+# cohort's own track, except that with probability `elective_overlap` a pick
+# comes from the whole elective pool instead; higher overlap makes the clash
+# graph denser across cohorts. Instructors teach `instructor_load` courses
+# each. Room capacities are drawn from `room_sizes` ({capacity: weight}); a
+# `lab_share` of courses are labs and need one of the lab ('R-') rooms.
+SYNTHETIC_DEFAULTS = {
+    'cohorts': 3,
+    'cohort_sizes': [60, 30, 20],   # Cycled over the cohorts
+    'core_courses': 3,
+    'electives': 10,
+    'electives_per_student': (1, 2),
+    'elective_overlap': 0.1,
+    'instructor_load': 2,
+    'slots_required': (2, 4),
+    'rooms': 10,
+    'room_sizes': {100: 1, 120: 3, 140: 6},
+    'lab_share': 0.2,
+}
+
+
+def parse_range(text):
+    """'3' -> (3, 3), '2-4' -> (2, 4)"""
+    lo, _, hi = text.partition('-')
+    return int(lo), int(hi or lo)
+
+
+def parse_weights(text):
+    """'60:1,120:3' -> {60: 1.0, 120: 3.0}"""
+    return {int(k): float(w) for k, w in (item.split(':') for item in text.split(','))}
+
+
+def synthetic_courses(params, rng):
+    """
+    Course catalogue: [(course_id, cohort or None, is_lab, slots_required)].
+    Cohort c owns courses core[c]; electives are split into one track per cohort.
+    """
+    catalogue = []
+    for c in range(params['cohorts']):
+        for _ in range(params['core_courses']):
+            catalogue.append((f"C{len(catalogue) + 1}", c))
+    for _ in range(params['electives']):
+        catalogue.append((f"C{len(catalogue) + 1}", None))
+    n_labs = round(params['lab_share'] * len(catalogue))
+    labs = set(rng.sample(range(len(catalogue)), n_labs))
+    return [(cid, cohort, i in labs, rng.randint(*params['slots_required']))
+            for i, (cid, cohort) in enumerate(catalogue)]
+
+
+def synthetic_student_rows(params, catalogue, rng, enrollment):
+    """Stream enrollment rows; counts per course are accumulated in `enrollment`."""
+    core = {}
+    for cid, cohort, _, _ in catalogue:
+        if cohort is not None:
+            core.setdefault(cohort, []).append(cid)
+    electives = [cid for cid, cohort, _, _ in catalogue if cohort is None]
+    n_cohorts = params['cohorts']
+    tracks = [electives[i::n_cohorts] or electives for i in range(n_cohorts)]
+    lo, hi = params['electives_per_student']
+
+    for c in range(n_cohorts):
+        size = params['cohort_sizes'][c % len(params['cohort_sizes'])]
+        for i in range(1, size + 1):
+            student_id = f"S{c + 1:04d}{i:05d}"
+            name = get_random_name(rng)
+            picks = set()
+            n_picks = min(rng.randint(lo, hi), len(electives))
+            while len(picks) < n_picks:
+                pool = electives if rng.random() < params['elective_overlap'] else tracks[c]
+                if len(picks) >= len(pool) and pool is tracks[c]:
+                    pool = electives
+                picks.add(rng.choice(pool))
+            for course in core.get(c, []) + sorted(picks):
+                enrollment[course] = enrollment.get(course, 0) + 1
+                yield [student_id, name, course]
+
+
+def synthetic_course_rows(params, catalogue, rng):
+    n_instructors = max(1, math.ceil(len(catalogue) / params['instructor_load']))
+    teachers = [f"Instructor {i + 1:04d}" for i in range(n_instructors)] * params['instructor_load']
+    rng.shuffle(teachers)
+    for (cid, cohort, is_lab, slots), inst in zip(catalogue, teachers):
+        kind = "Lab" if is_lab else "Lecture"
+        batch = f"Cohort {cohort + 1}" if cohort is not None else "Elective"
+        yield (cid, f"{cid} {batch} {kind}", slots, inst, "", "", batch, slots)
+
+
+def synthetic_room_rows(params, rng):
+    sizes = list(params['room_sizes'])
+    weights = [params['room_sizes'][c] for c in sizes]
+    n_labs = max(1, round(params['lab_share'] * params['rooms'])) if params['lab_share'] else 0
+    for i in range(params['rooms']):
+        name = f"R-{i + 1:03d}" if i < n_labs else f"L{i + 1:03d}"
+        yield (name, rng.choices(sizes, weights)[0])
+
+
+def write_synthetic_instance(out_dir=OUT, params=None, seed=None, chunk_size=CHUNK_SIZE):
+    """
+    Write a parameterised instance to out_dir. Returns ({course: enrollment}, {room: capacity}).
+    The same params and seed always produce the same files.
+    """
+    out_dir = Path(out_dir)
+    params = {**SYNTHETIC_DEFAULTS, **(params or {})}
+    rng = random.Random(seed)
+    catalogue = synthetic_courses(params, rng)
+    room_list = list(synthetic_room_rows(params, rng))
+    write_csv(out_dir / 'rooms.csv', ROOM_HEADER, room_list)
+    write_csv(out_dir / 'courses.csv', COURSE_HEADER, synthetic_course_rows(params, catalogue, rng))
+    enrollment = {}
+    write_csv(out_dir / "student_data_large.csv", STUDENT_HEADER,
+              synthetic_student_rows(params, catalogue, rng, enrollment), chunk_size)
+    return enrollment, dict(room_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OptiTime data generator")
+    parser.add_argument('--out', default=str(OUT), help="output directory")
+    parser.add_argument('--seed', type=int, default=None, help="random seed (same seed, same files)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="enrollment rows per CSV write")
+    sub = parser.add_subparsers(dest='mode')
+    syn = sub.add_parser('synthetic', help="parameterised instance instead of the built-in cohort model")
+    d = SYNTHETIC_DEFAULTS
+    syn.add_argument('--cohorts', type=int, default=d['cohorts'])
+    syn.add_argument('--cohort-sizes', default=','.join(map(str, d['cohort_sizes'])),
+                     help="students per cohort, comma-separated and cycled (e.g. 60,30,20)")
+    syn.add_argument('--core-courses', type=int, default=d['core_courses'], help="courses every cohort member takes")
+    syn.add_argument('--electives', type=int, default=d['electives'], help="size of the shared elective pool")
+    syn.add_argument('--electives-per-student', default='%d-%d' % d['electives_per_student'], help="e.g. 2-3")
+    syn.add_argument('--elective-overlap', type=float, default=d['elective_overlap'],
+                     help="0: electives stay within the cohort's track, 1: uniform over the pool")
+    syn.add_argument('--instructor-load', type=int, default=d['instructor_load'], help="courses per instructor")
+    syn.add_argument('--slots-required', default='%d-%d' % d['slots_required'], help="weekly classes per course, e.g. 2-4")
+    syn.add_argument('--rooms', type=int, default=d['rooms'])
+    syn.add_argument('--room-sizes', default=','.join(f"{c}:{w}" for c, w in d['room_sizes'].items()),
+                     help="capacity:weight distribution, e.g. 60:2,120:5,250:1")
+    syn.add_argument('--lab-share', type=float, default=d['lab_share'], help="share of lab courses and lab rooms")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if args.mode != 'synthetic':
+        n_rows = write_instance(out_dir, seed=args.seed, chunk_size=args.chunk_size)
+        print(f"Successfully generated {n_rows} rows in 'student_data_large.csv'")
+        print(f"Created courses.csv and rooms.csv in '{out_dir}'")
+        return
+
+    params = {
+        'cohorts': args.cohorts,
+        'cohort_sizes': [int(n) for n in args.cohort_sizes.split(',')],
+        'core_courses': args.core_courses,
+        'electives': args.electives,
+        'electives_per_student': parse_range(args.electives_per_student),
+        'elective_overlap': args.elective_overlap,
+        'instructor_load': args.instructor_load,
+        'slots_required': parse_range(args.slots_required),
+        'rooms': args.rooms,
+        'room_sizes': parse_weights(args.room_sizes),
+        'lab_share': args.lab_share,
+    }
+    enrollment, room_caps = write_synthetic_instance(out_dir, params, seed=args.seed, chunk_size=args.chunk_size)
+    print(f"Successfully generated {sum(enrollment.values())} rows in 'student_data_large.csv' "
+          f"({len(enrollment)} courses, {len(room_caps)} rooms)")
+    too_big = {c: n for c, n in enrollment.items() if n > max(room_caps.values())}
+    if too_big:
+        print(f"Warning: {len(too_big)} courses have more students than the largest room "
+              f"({max(room_caps.values())}); the models will find no eligible room for them.")
 
-# rooms.csv
-with open(OUT / 'rooms.csv','w', newline='', encoding='utf8') as f:
-    writer = csv.writer(f)
-    writer.writerow(['room','capacity'])
-    writer.writerows(rooms)
 
-print("Created courses.csv and rooms.csv in the current directory")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import pandas as pd
+import numpy as np
+import json
+import sys
+import time
+import heapq
+from preprocess import prepare_instance, conflict_neighbours
+from formulation import timetable_entries
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+PROF_DAILY_LIMIT = 2   # Soft: prefer slots that keep instructors at or below this per day
+OUTPUT_FILE = 'greedy_timetable_output.json'
+
+# ==========================================
+# DSATUR-style constructive heuristic.
+# Courses are vertices of the conflict graph (shared students or shared
+# instructor); time slots are colours and a course needs slots_required
+# distinct colours. The next course to colour is always the one with the
+# fewest slots left open (highest saturation). Each of its classes goes to
+# the cheapest open slot (new day first, instructor under the daily limit,
+# early in the day) that still has a free eligible room.
+# ==========================================
+
+
+def greedy_timetable(instance, prof_daily_limit=PROF_DAILY_LIMIT):
+    """
+    Build a timetable without a solver.
+    Returns (assignments, unscheduled): a list of (course, time_slot, room)
+    and {course: classes that could not be placed}.
+    """
+    df_courses = instance['df_courses']
+    time_slots = instance['time_slots']
+    days = instance['days']
+    eligible_rooms = instance['eligible_rooms']
+    room_capacity = instance['room_capacity']
+    n_slots = len(time_slots)
+
+    slot_day = np.array([days.index(t.split('_')[0]) for t in time_slots])
+    slot_rank = np.array([int(t.split('_')[1]) - 1 for t in time_slots])
+
+    required = df_courses.set_index('course_id')['slots_required'].to_dict()
+    neighbours = conflict_neighbours(instance)
+    instructors_of = {}
+    for inst, c_list in instance['instructor_map'].items():
+        if inst == 'TBD': continue
+        for c in c_list:
+            instructors_of.setdefault(c, []).append(inst)
+
+    # Per course (row of index[c]), kept up to date after every placement instead of
+    # being recomputed per pick:
+    #   blocked[i, t]     a conflicting course already sits at t
+    #   free_rooms[i, t]  eligible rooms of the course still free at t
+    #   n_open[c]         slots that are neither blocked nor out of rooms
+    #   n_todo[c]         conflicting courses not placed yet
+    courses = list(required)
+    index = {c: i for i, c in enumerate(courses)}
+    blocked = np.zeros((len(courses), n_slots), dtype=bool)
+    free_rooms = np.array([len(eligible_rooms.get(c, [])) for c in courses], dtype=int)[:, None].repeat(n_slots, axis=1)
+    n_open = {c: n_slots if eligible_rooms.get(c) else 0 for c in courses}
+    neighbour_rows = {c: np.array(sorted(index[n] for n in neighbours[c] if n in index), dtype=int) for c in courses}
+    room_rows = {}
+    for c in courses:
+        for r in eligible_rooms.get(c, []):
+            room_rows.setdefault(r, []).append(index[c])
+    room_rows = {r: np.array(rows, dtype=int) for r, rows in room_rows.items()}
+    room_busy = {r: np.zeros(n_slots, dtype=bool) for r in room_capacity}
+    inst_day_load = {inst: np.zeros(len(days), dtype=int) for inst in instance['instructor_map']}
+
+    todo = {c for c, h in required.items() if h > 0}
+    in_todo = np.array([c in todo for c in courses], dtype=bool)
+    n_todo = {c: len(neighbours[c] & todo) for c in todo}
+
+    # DSATUR pick: fewest open slots, then most conflicts, most classes, fewest rooms.
+    # A heap with lazy invalidation: a course whose key changed is pushed again.
+    def key(c):
+        return (n_open[c] - required[c], -n_todo[c], -required[c], len(eligible_rooms[c]), c)
+
+    heap = [key(c) for c in todo]
+    heapq.heapify(heap)
+
+    def close_slots(rows):
+        for i in rows:
+            n_open[courses[i]] -= 1
+            heapq.heappush(heap, key(courses[i]))
+
+    assignments = []
+    unscheduled = {}
+    while todo:
+        entry = heapq.heappop(heap)
+        c = entry[-1]
+        if c not in todo or entry != key(c):
+            continue   # placed already, or a stale key
+        todo.remove(c)
+        in_todo[index[c]] = False
+        for n in neighbours[c] & todo:
+            n_todo[n] -= 1
+            heapq.heappush(heap, key(n))
+
+        candidates = list(np.flatnonzero(~blocked[index[c]] & (free_rooms[index[c]] > 0)))
+        used_days = np.zeros(len(days), dtype=bool)
+        by_size = sorted(eligible_rooms[c], key=lambda r: (room_capacity[r], r))
+        placed = 0
+        while placed < required[c] and candidates:
+            overloaded = np.zeros(n_slots, dtype=bool)
+            for inst in instructors_of.get(c, []):
+                overloaded |= inst_day_load[inst][slot_day] >= prof_daily_limit
+            t = min(candidates, key=lambda t: (used_days[slot_day[t]], overloaded[t], slot_rank[t], t))
+            candidates.remove(t)
+
+            room = next(r for r in by_size if not room_busy[r][t])   # smallest free room
+            room_busy[room][t] = True
+            used_days[slot_day[t]] = True
+            # Only the courses that conflict with c or could use this room change
+            rows = neighbour_rows[c]
+            close_slots(rows[in_todo[rows] & ~blocked[rows, t] & (free_rooms[rows, t] > 0)])
+            blocked[rows, t] = True
+            rows = room_rows[room]
+            free_rooms[rows, t] -= 1
+            close_slots(rows[in_todo[rows] & ~blocked[rows, t] & (free_rooms[rows, t] == 0)])
+            for inst in instructors_of.get(c, []):
+                inst_day_load[inst][slot_day[t]] += 1
+            assignments.append((c, time_slots[t], room))
+            placed += 1
+
+        if placed < required[c]:
+            unscheduled[c] = required[c] - placed
+
+    return assignments, unscheduled
+
+
+def main():
+    print("Loading Data...")
+    try:
+        df_courses = pd.read_csv('courses.csv')
+        df_students = pd.read_csv('student_data_large.csv')
+        df_rooms = pd.read_csv('rooms.csv')
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    instance = prepare_instance(df_courses, df_rooms, df_students)
+    t1 = time.perf_counter()
+    assignments, unscheduled = greedy_timetable(instance)
+    t2 = time.perf_counter()
+    print(f"Preprocessing: {(t1 - t0) * 1000:.1f} ms, greedy construction: {(t2 - t1) * 1000:.1f} ms")
+
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(timetable_entries(assignments, df_courses), f, indent=4)
+
+    if unscheduled:
+        print(f"Warning: could not place {sum(unscheduled.values())} classes: {unscheduled}")
+        print(f"Partial timetable saved to {OUTPUT_FILE} (usable as a MILP warm start).")
+        sys.exit(2)
+    print(f"[SUCCESS] Feasible timetable with {len(assignments)} classes saved to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import pulp
+
+# ==========================================
+# INCREMENTAL RE-SCHEDULING
+# ==========================================
+# After every solve penalty_model.py stores a small snapshot of its inputs
+# (one digest per course and per room) next to the timetable. An incremental
+# run diffs the current CSVs against that snapshot, keeps every untouched
+# course fixed at its previous slots and only re-optimizes the changed
+# courses plus their conflict neighbours (shared students or instructor)
+# and the courses sharing a room with them.
+
+
+def snapshot_path(timetable_path):
+    return timetable_path.rsplit('.json', 1)[0] + '.inputs.json'
+
+
+def _digest(*parts):
+    return hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+def input_snapshot(df_courses, df_rooms, df_students):
+    """Digest of every course (row + enrolled students) and every room."""
+    students_by_course = df_students.groupby('course_id', observed=True)['student_id'].apply(lambda s: sorted(set(s))).to_dict()
+    courses = {}
+    for row in df_courses.to_dict('records'):
+        cid = row['course_id']
+        courses[cid] = _digest(row, students_by_course.get(cid, []))
+    rooms = {r: _digest(cap) for r, cap in df_rooms[['room', 'capacity']].itertuples(index=False)}
+    return {'courses': courses, 'rooms': rooms}
+
+
+def save_snapshot(path, snapshot):
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, indent=1)
+
+
+def load_snapshot(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def changed_courses(old_snapshot, new_snapshot, previous_entries):
+    """
+    Courses whose row or enrollment changed, new courses, and courses that
+    were sitting in a room that changed or disappeared.
+    """
+    old_c, new_c = old_snapshot['courses'], new_snapshot['courses']
+    changed = {c for c, h in new_c.items() if old_c.get(c) != h}
+
+    old_r, new_r = old_snapshot['rooms'], new_snapshot['rooms']
+    changed_rooms = {r for r, h in old_r.items() if new_r.get(r) != h}
+    changed |= {e['Course'] for e in previous_entries if e['Room'] in changed_rooms and e['Course'] in new_c}
+    return changed
+
+
+def affected_courses(changed, neighbours, previous_entries):
+    """
+    Changed courses, their neighbours in the (new) conflict graph
+    (preprocess.conflict_neighbours: shared students or instructor) and the
+    courses placed in the rooms the changed courses held in the previous timetable.
+    """
+    affected = set(changed)
+    for c in changed:
+        affected.update(neighbours.get(c, ()))
+    rooms = {e['Room'] for e in previous_entries if e['Course'] in changed}
+    affected.update(e['Course'] for e in previous_entries if e['Room'] in rooms and e['Course'] in neighbours)
+    return affected
+
+
+def move_penalty_term(model_vars, free_courses):
+    """
+    Number of classes of the free courses placed anywhere other than their
+    previous slot and room; added to the objective to keep re-optimization
+    minimal. Call apply_warm_start() with the previous timetable first.
+    """
+    return pulp.lpSum(v for key, v in model_vars.items() if key[0] in free_courses and v.varValue != 1)
+
+
+def fix_unaffected(model_vars, free_courses):
+    """
+    Fix every variable of a course outside free_courses at its current
+    (warm start) value. Call apply_warm_start() first. Returns the number of
+    fixed variables; release them again with release_fixed().
+    """
+    fixed = 0
+    for key, var in model_vars.items():
+        if key[0] not in free_courses:
+            var.fixValue()
+            fixed += 1
+    return fixed
+
+
+def release_fixed(model_vars):
+    for var in model_vars.values():
+        var.unfixValue()
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: memory is not recorded
+    resource = None
+
+# ==========================================
+# PHASE INSTRUMENTATION
+# ==========================================
+# Every phase of a run (loading, preprocessing, each constraint family,
+# solve, export) is timed and written as one JSON line:
+#   {"run_id", "script", "phase", "wall_s", "rss_mb", "rss_delta_mb", "rows", "variables", ...}
+# "rows" is the number of constraints the phase added to the problem;
+# "variables" is filled in by phases that create variables.
+# All helpers accept metrics=None and then do nothing, so library code can
+# be instrumented unconditionally.
+
+
+def current_rss_mb():
+    """Current resident set size (Linux /proc), else peak RSS from getrusage, else None."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def open_metrics(path, script):
+    """
+    Start a metrics stream for one run of `script`. Records are appended to
+    path as JSON lines ('-' writes to stderr). Returns the metrics handle.
+    """
+    return {'path': path, 'script': script, 'run_id': uuid.uuid4().hex[:12], 'started': time.time()}
+
+
+def emit(metrics, record):
+    if metrics is None:
+        return
+    record = {'run_id': metrics['run_id'], 'script': metrics['script'], **record}
+    line = json.dumps(record, default=str)
+    if metrics['path'] == '-':
+        print(line, file=sys.stderr)
+    else:
+        with open(metrics['path'], 'a') as f:
+            f.write(line + '\n')
+
+
+@contextmanager
+def phase(metrics, name, prob=None):
+    """
+    Time the enclosed block. Yields the record dict, so the block can add
+    counts (e.g. rec['variables'] = len(x)). Rows added to prob are counted
+    automatically.
+    """
+    if metrics is None:
+        yield {}
+        return
+    rec = {'phase': name}
+    rows_before = len(prob.constraints) if prob is not None else None
+    rss_before = current_rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec['wall_s'] = round(time.perf_counter() - t0, 6)
+        rss_after = current_rss_mb()
+        if rss_after is not None:
+            rec['rss_mb'] = round(rss_after, 1)
+            rec['rss_delta_mb'] = round(rss_after - rss_before, 1)
+        if prob is not None:
+            rec['rows'] = len(prob.constraints) - rows_before
+        emit(metrics, rec)
+
+
+def close_metrics(metrics, **summary):
+    """Final 'total' record with the run's wall time and any summary fields (status, objective, sizes)."""
+    if metrics is None:
+        return
+    rss = current_rss_mb()
+    emit(metrics, {
+        'phase': 'total', 'wall_s': round(time.time() - metrics['started'], 6),
+        'rss_mb': round(rss, 1) if rss is not None else None, **summary,
+    })
@@ -0,0 +1,172 @@
+import pandas as pd
+import pulp
+import json
+import random
+import sys
+import time
+import argparse
+from formulation import build_penalty_model, apply_warm_start, solution_assignments, timetable_entries
+from preprocess import prepare_instance, clash_cliques
+from greedy import greedy_timetable
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+# Objective weights: same meaning and defaults as penalty_model.py
+W1_TIME_PENALTY = 5
+W2_PROF_OVERLOAD = 100
+PROF_DAILY_LIMIT = 2
+FORMULATION = "time_room"
+ROOM_SYMMETRY = "pool"
+
+LNS_TIME_BUDGET = 300        # Total wall-clock budget (seconds)
+INITIAL_TIME_LIMIT = 30      # First solve when no --start timetable is given
+SUBPROBLEM_TIME_LIMIT = 10   # Per neighbourhood re-solve
+NEIGHBOURHOODS = ["day", "instructor", "clique"]
+RANDOM_SEED = 42
+OUTPUT_FILE = 'timetable_output.json'
+
+# ==========================================
+# Large Neighbourhood Search on top of the penalty_model.py formulation.
+# Each iteration frees one neighbourhood (all classes of one day, all courses
+# of one instructor, or one clique of clashing courses), fixes every other
+# variable at the incumbent, re-solves the small sub-MILP with the incumbent
+# as MIP start, and keeps the result if the objective improved.
+# ==========================================
+
+
+def pick_neighbourhood(kind, instance, cliques, rng):
+    """Return (label, predicate(key) -> True if the variable is free)."""
+    if kind == "day":
+        day = rng.choice(instance['days'])
+        return f"day {day}", lambda key: key[1].startswith(day + '_')
+    if kind == "instructor":
+        inst = rng.choice(sorted(instance['instructor_map']))
+        courses = set(instance['instructor_map'][inst])
+        return f"instructor {inst}", lambda key: key[0] in courses
+    members = set(rng.choice(cliques))
+    return f"clique {sorted(members)}", lambda key: key[0] in members
+
+
+def solve(prob, time_limit):
+    solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, warmStart=True)
+    prob.solve(solver)
+    # sol_status also covers 'time limit reached with an integer solution'
+    return prob.sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible)
+
+
+def snapshot(prob):
+    return {v.name: v.varValue for v in prob.variables()}
+
+
+def restore(prob, values):
+    for v in prob.variables():
+        v.setInitialValue(values.get(v.name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OptiTime Large Neighbourhood Search")
+    parser.add_argument('--start', metavar='JSON',
+                        help="timetable to start from, or 'greedy' for the DSATUR constructor (default: short CBC solve)")
+    parser.add_argument('--budget', type=float, default=LNS_TIME_BUDGET, help="wall-clock budget in seconds")
+    args = parser.parse_args()
+    t_start = time.time()
+
+    # ==========================================
+    # 1. LOAD & BUILD
+    # ==========================================
+    print("Loading Data...")
+    try:
+        df_courses = pd.read_csv('courses.csv')
+        df_students = pd.read_csv('student_data_large.csv')
+        df_rooms = pd.read_csv('rooms.csv')
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        sys.exit(1)
+
+    instance = prepare_instance(df_courses, df_rooms, df_students)
+    cliques = clash_cliques(instance['student_clashes']) or [[c] for c in df_courses['course_id']]
+
+    print("Building MILP Model with Objectives...")
+    prob, model_vars, slot_vars = build_penalty_model(
+        instance, W1_TIME_PENALTY, W2_PROF_OVERLOAD, PROF_DAILY_LIMIT,
+        formulation=FORMULATION, room_symmetry=ROOM_SYMMETRY,
+    )
+    room_pools = instance['room_pools'] if ROOM_SYMMETRY == "pool" else None
+
+    # ==========================================
+    # 2. INITIAL SOLUTION
+    # ==========================================
+    if args.start:
+        if args.start == 'greedy':
+            entries = timetable_entries(greedy_timetable(instance)[0], df_courses)
+        else:
+            with open(args.start, 'r') as f:
+                entries = json.load(f)
+        mapped = apply_warm_start(model_vars, slot_vars, FORMULATION, entries, room_pools=room_pools)
+        print(f"Starting from '{args.start}' ({mapped}/{len(entries)} classes mapped).")
+        # Complete the start (continuous overload variables) with every class fixed
+        for var in model_vars.values():
+            var.fixValue()
+        ok = solve(prob, INITIAL_TIME_LIMIT)
+        for var in model_vars.values():
+            var.unfixValue()
+    else:
+        print(f"Initial solve ({INITIAL_TIME_LIMIT}s)...")
+        ok = solve(prob, min(INITIAL_TIME_LIMIT, args.budget))
+
+    if not ok:
+        print("No feasible starting timetable found.")
+        sys.exit(1)
+
+    best_obj = pulp.value(prob.objective)
+    incumbent = snapshot(prob)
+    print(f"[LNS] iter 0 | {time.time() - t_start:7.1f}s | objective {best_obj:.1f} | initial")
+
+    # ==========================================
+    # 3. LNS LOOP
+    # ==========================================
+    rng = random.Random(RANDOM_SEED)
+    iteration = 0
+    while True:
+        remaining = args.budget - (time.time() - t_start)
+        if remaining < 1:
+            break
+        iteration += 1
+        label, is_free = pick_neighbourhood(rng.choice(NEIGHBOURHOODS), instance, cliques, rng)
+
+        restore(prob, incumbent)
+        for key, var in model_vars.items():
+            if not is_free(key):
+                var.fixValue()
+
+        ok = solve(prob, min(SUBPROBLEM_TIME_LIMIT, remaining))
+        for var in model_vars.values():
+            var.unfixValue()
+
+        obj = pulp.value(prob.objective) if ok else None
+        if obj is not None and obj < best_obj - 1e-6:
+            best_obj = obj
+            incumbent = snapshot(prob)
+            outcome = "improved"
+        else:
+            outcome = "kept"
+        print(f"[LNS] iter {iteration} | {time.time() - t_start:7.1f}s | objective {best_obj:.1f} | {outcome} | {label}")
+
+    # ==========================================
+    # 4. EXPORT
+    # ==========================================
+    restore(prob, incumbent)
+    results = timetable_entries(
+        solution_assignments(model_vars, FORMULATION, instance['eligible_rooms'], instance['room_capacity'],
+                             room_pools=room_pools),
+        df_courses,
+    )
+
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Success! Saved LNS solution after {iteration} iterations (Objective: {best_obj})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+import pulp
+
+# ==========================================
+# CONTENT-ADDRESSED MODEL CACHE
+# ==========================================
+# The built constraint system depends only on the input CSVs and the
+# structural configuration (days, slots per day, daily limit, formulation
+# options) -- not on the objective weights. It is stored as MPS plus a
+# variable-name map under a hash of exactly those inputs, so a re-run that
+# only changes a weight reloads it and rebuilds just the objective.
+
+MODEL_CACHE_DIR = os.path.join('.optitime_cache', 'models')
+MODEL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_FORMAT_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(input_files, structural_config):
+    """Hash of the input file contents plus the structural config (a JSON-serialisable dict)."""
+    h = hashlib.sha256()
+    h.update(json.dumps({'version': CACHE_FORMAT_VERSION, 'config': structural_config}, sort_keys=True).encode())
+    for path in input_files:
+        h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+
+def _entry_paths(key, cache_dir):
+    base = os.path.join(cache_dir, key)
+    return base + '.mps', base + '.json'
+
+
+def store_model(key, prob, model_vars, overload_vars, cache_dir=MODEL_CACHE_DIR,
+                max_bytes=MODEL_CACHE_MAX_BYTES):
+    """Persist the built problem (constraints + variables) and its variable map."""
+    os.makedirs(cache_dir, exist_ok=True)
+    mps_path, map_path = _entry_paths(key, cache_dir)
+    # An empty objective makes writeMPS add a dummy column to prob; store a
+    # placeholder instead (callers set the real objective after loading anyway)
+    if prob.objective is None or prob.objective.isNumericalConstant():
+        prob.setObjective(pulp.lpSum(overload_vars) if overload_vars else pulp.lpSum(model_vars.values()))
+    prob.writeMPS(mps_path)
+    with open(map_path, 'w') as f:
+        json.dump({
+            'model_vars': [[list(k), v.name] for k, v in model_vars.items()],
+            'overload_vars': [v.name for v in overload_vars],
+        }, f)
+    evict(cache_dir, max_bytes)
+
+
+def load_model(key, name, cache_dir=MODEL_CACHE_DIR):
+    """
+    Reload a cached problem. Returns (prob, model_vars, overload_vars) with
+    model_vars keyed exactly as when it was stored, or None on a miss.
+    The objective must be set again by the caller.
+    """
+    mps_path, map_path = _entry_paths(key, cache_dir)
+    if not (os.path.exists(mps_path) and os.path.exists(map_path)):
+        return None
+    with open(map_path, 'r') as f:
+        var_map = json.load(f)
+    variables, prob = pulp.LpProblem.fromMPS(mps_path, sense=pulp.LpMinimize)
+    prob.name = name
+    model_vars = {tuple(k): variables[v] for k, v in var_map['model_vars']}
+    overload_vars = [variables[v] for v in var_map['overload_vars']]
+
+    # Mark as recently used for eviction
+    now = time.time()
+    os.utime(mps_path, (now, now))
+    os.utime(map_path, (now, now))
+    return prob, model_vars, overload_vars
+
+
+def evict(cache_dir=MODEL_CACHE_DIR, max_bytes=MODEL_CACHE_MAX_BYTES):
+    """
+    Delete least recently used entries (all files sharing a key) until the
+    cache directory fits in max_bytes.
+    """
+    entries = {}   # key -> (size, mtime, paths)
+    for fname in os.listdir(cache_dir):
+        key, _ = os.path.splitext(fname)
+        path = os.path.join(cache_dir, fname)
+        st = os.stat(path)
+        size, mtime, paths = entries.get(key, (0, 0, []))
+        paths.append(path)
+        entries[key] = (size + st.st_size, max(mtime, st.st_mtime), paths)
+
+    total = sum(size for size, _, _ in entries.values())
+    for size, _, paths in sorted(entries.values(), key=lambda entry: entry[1]):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            os.remove(path)
+        total -= size
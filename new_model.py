@@ -1,8 +1,55 @@
 import pandas as pd
 import pulp
 import json
-from io import StringIO
 import sys
+import argparse
+from formulation import build_hard_constraints, solution_assignments, timetable_entries
+from timetable_io import COLUMNAR_FORMATS, columnar_path, write_columnar, parquet_available
+from preprocess import (
+    build_instructor_map, build_room_eligibility, build_clash_graph, build_room_pools, load_enrollments,
+    clash_graph_from_bundles,
+)
+from dataset import DATASET_DIR, load_dataset
+from instrumentation import open_metrics, phase, close_metrics
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+# "clique": one row per clash-graph clique per slot (fewer rows, tighter LP)
+# "pairwise": one row per clashing course pair per slot
+STUDENT_CLASH_MODE = "clique"
+
+# "time_room": x[c, t, r] binaries (one per eligible room)
+# "two_stage": y[c, t] binaries + room-class capacity rows, rooms assigned after the solve
+FORMULATION = "time_room"
+
+# Identical rooms (time_room only):
+# "pool": one counted resource per pool, "lex": lexicographic symmetry breaking, "none"
+ROOM_SYMMETRY = "pool"
+
+# Load the preprocessed binary dataset (dataset.py; compiled on first use and
+# whenever a CSV changes) instead of parsing the CSVs on every run
+USE_DATASET = True
+
+# Per-phase wall time, memory and row/variable counts as JSON lines (None: off, '-': stderr)
+METRICS_FILE = 'new_model_metrics.jsonl'
+
+# Solver budget in seconds (None: run CBC until it proves feasibility or infeasibility)
+SOLVER_TIME_LIMIT = None
+
+# Also write the timetable as "npz" or "parquet" next to the JSON (None: JSON only)
+COLUMNAR_OUTPUT = None
+
+parser = argparse.ArgumentParser(description="OptiTime feasibility model (hard constraints only)")
+parser.add_argument('--time-limit', type=float, default=SOLVER_TIME_LIMIT, help="solver budget in seconds")
+parser.add_argument('--metrics', metavar='PATH', default=METRICS_FILE,
+                    help="append per-phase metrics as JSON lines to PATH ('-' for stderr, '' to disable)")
+parser.add_argument('--columnar', choices=COLUMNAR_FORMATS, default=COLUMNAR_OUTPUT,
+                    help="also write a compact columnar copy of the timetable next to the JSON")
+args = parser.parse_args()
+if args.columnar == 'parquet' and not parquet_available():
+    parser.error("--columnar parquet needs pyarrow (pip install pyarrow); use --columnar npz instead")
+metrics = open_metrics(args.metrics, 'new_model') if args.metrics else None
 
 # ==========================================
 # 1. LOAD DATA 
@@ -10,25 +57,41 @@ import sys
 
 print("Loading Data...")
 
-# A. Courses (External CSV)
-try:
-    df_courses = pd.read_csv('courses.csv')
-    print(f"Loaded {len(df_courses)} courses from 'courses.csv'.")
-except FileNotFoundError:
-    print("Error: 'courses.csv' not found. Please ensure the file is in the same directory.")
-    sys.exit(1)
-
-# B. Students (External CSV - NEW DATASET)
-try:
-    df_students = pd.read_csv('student_data_large.csv')
-    print(f"Loaded {len(df_students)} student records from 'student_data_large.csv'.")
-except FileNotFoundError:
-    print("Error: 'student_data_large.csv' not found.")
-    sys.exit(1)
-
-# C. Rooms 
-df_rooms = pd.read_csv('rooms.csv')
-print(f"Loaded {len(df_rooms)} rooms.")
+with phase(metrics, "load") as rec:
+    dataset = None
+    if USE_DATASET:
+        try:
+            dataset = load_dataset()
+        except FileNotFoundError as e:
+            print(f"Error: '{e.filename}' not found. Please ensure the file is in the same directory.")
+            sys.exit(1)
+        enrollments = dataset
+        df_courses, df_rooms, df_students = dataset['df_courses'], dataset['df_rooms'], dataset['df_students']
+        print(f"Loaded {len(df_courses)} courses, {len(df_students)} student records and {len(df_rooms)} rooms "
+              f"from the {'freshly compiled ' if dataset['compiled'] else ''}dataset in {DATASET_DIR}.")
+        rec['compiled'] = dataset['compiled']
+    else:
+        # A. Courses (External CSV)
+        try:
+            df_courses = pd.read_csv('courses.csv')
+            print(f"Loaded {len(df_courses)} courses from 'courses.csv'.")
+        except FileNotFoundError:
+            print("Error: 'courses.csv' not found. Please ensure the file is in the same directory.")
+            sys.exit(1)
+
+        # B. Students (External CSV - NEW DATASET)
+        try:
+            enrollments = load_enrollments('student_data_large.csv')
+            df_students = enrollments['df_students']
+            print(f"Loaded {len(df_students)} student records from 'student_data_large.csv'.")
+        except FileNotFoundError:
+            print("Error: 'student_data_large.csv' not found.")
+            sys.exit(1)
+
+        # C. Rooms 
+        df_rooms = pd.read_csv('rooms.csv')
+        print(f"Loaded {len(df_rooms)} rooms.")
+    rec.update(courses=len(df_courses), enrollments=len(df_students), rooms=len(df_rooms))
 
 # ==========================================
 # 2. PRE-PROCESSING
@@ -37,35 +100,33 @@ print(f"Loaded {len(df_rooms)} rooms.")
 print("Preprocessing Constraints...")
 
 # A. Calculate Enrollments vs Room Capacity
-enrollment_counts = df_students.groupby('course_id').size().to_dict()
+with phase(metrics, "enrollment"):
+    # Counted while streaming the CSV
+    enrollment_counts = enrollments['enrollment']
 
 # B. Map Instructors to Courses
-instructor_map = {} 
-for idx, row in df_courses.iterrows():
-    cid = row['course_id']
-    instructors = [row['instructor1'], row['instructor2']]
-    for inst in instructors:
-        if pd.notna(inst):
-            if inst not in instructor_map: instructor_map[inst] = []
-            instructor_map[inst].append(cid)
-
-# C. Build Student Conflict Matrix
+with phase(metrics, "instructor_map"):
+    instructor_map = dataset['instructor_map'] if dataset else build_instructor_map(df_courses)
+
+# C. Course -> Eligible Rooms (capacity + lab/lecture room type)
+with phase(metrics, "room_eligibility"):
+    eligible_rooms = build_room_eligibility(df_courses, df_rooms, enrollment_counts)
+
+# D. Pools of interchangeable rooms (same capacity + lab flag)
+with phase(metrics, "room_pools"):
+    room_pools = build_room_pools(df_rooms)
+
+# E. Build Student Conflict Matrix
 # This ensures that if a student takes Course A and Course B, they aren't scheduled at the same time.
-student_clashes = set() 
-student_groups = df_students.groupby('student_id')['course_id'].apply(list)
-
-for _, taken_courses in student_groups.items():
-    # Sort courses to avoid duplicate pairs like (C1, C2) and (C2, C1)
-    taken_courses = sorted(taken_courses)
-    for i in range(len(taken_courses)):
-        for j in range(i + 1, len(taken_courses)):
-            c1 = taken_courses[i]
-            c2 = taken_courses[j]
-            student_clashes.add((c1, c2))
+# (c1, c2) -> number of students taking both courses
+with phase(metrics, "clash_graph") as rec:
+    # The dataset stores the students already collapsed into course bundles
+    student_clashes = clash_graph_from_bundles(*dataset['bundles']) if dataset else build_clash_graph(df_students)
+    rec['clash_pairs'] = len(student_clashes)
 
 print(f"Identified {len(student_clashes)} course pairs that share students (Clash Constraints).")
 
-# D. Define Time Slots (Mon-Fri, 6 slots/day)
+# F. Define Time Slots (Mon-Fri, 6 slots/day)
 days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
 slots_per_day = 6 
 time_slots = [f"{d}_{s+1}" for d in days for s in range(slots_per_day)]
@@ -77,64 +138,20 @@ time_slots = [f"{d}_{s+1}" for d in days for s in range(slots_per_day)]
 print("Building MILP Model...")
 prob = pulp.LpProblem("OptiTime_Large_Scheduler", pulp.LpMinimize)
 
-course_ids = df_courses['course_id'].tolist()
-room_ids = df_rooms['room'].tolist()
-
-# --- VARIABLES ---
-# x[c, t, r] = 1 if course c is at time t in room r
-x = {}
-vars_count = 0
-
-for c in course_ids:
-    req_enrollment = enrollment_counts.get(c, 0)
-    for t in time_slots:
-        for r in room_ids:
-            # 1. Capacity Constraint (Hard Filtering)
-            r_cap = df_rooms.loc[df_rooms['room'] == r, 'capacity'].values[0]
-            if r_cap >= req_enrollment:
-                
-                # 2. Lab vs Lecture Room Constraint
-                is_lab = 'Lab' in str(df_courses.loc[df_courses['course_id']==c, 'title'].values[0])
-                is_lab_room = 'R-' in r
-                
-                if is_lab and not is_lab_room: continue
-                if not is_lab and is_lab_room: continue
-                    
-                x[(c, t, r)] = pulp.LpVariable(f"x_{c}_{t}_{r}", cat='Binary')
-                vars_count += 1
-
-print(f"Created {vars_count} binary variables.")
-
-# --- CONSTRAINTS ---
+room_capacity = df_rooms.set_index('room')['capacity'].to_dict()
 
+# --- VARIABLES & CONSTRAINTS ---
+# Capacity and Lab vs Lecture room filtering are already folded into eligible_rooms.
 # 1. Slot Requirement: Each course must be scheduled exactly h_c times
-for idx, row in df_courses.iterrows():
-    c = row['course_id']
-    required = row['slots_required']
-    prob += pulp.lpSum([x.get((c, t, r), 0) for t in time_slots for r in room_ids]) == required, f"Req_Slots_{c}"
-
 # 2. Room Conflict: Max 1 course per room per time slot
-for t in time_slots:
-    for r in room_ids:
-        prob += pulp.lpSum([x.get((c, t, r), 0) for c in course_ids]) <= 1, f"Room_Conflict_{r}_{t}"
-
+#    (pooled rooms: max pool size; two-stage: per room-size class)
 # 3. Instructor Conflict: Max 1 course per instructor per time slot
-for inst, c_list in instructor_map.items():
-    for t in time_slots:
-        prob += pulp.lpSum([x.get((c, t, r), 0) for c in c_list for r in room_ids]) <= 1, f"Inst_Conflict_{inst}_{t}"
-
 # 4. Student Clash: Courses sharing students cannot be at the same time
-# Optimizing: Only check if both c1 and c2 have variables for this time t
-for (c1, c2) in student_clashes:
-    for t in time_slots:
-        # Get all room options for c1 at time t
-        c1_vars = [x[(c1, t, r)] for r in room_ids if (c1, t, r) in x]
-        # Get all room options for c2 at time t
-        c2_vars = [x[(c2, t, r)] for r in room_ids if (c2, t, r) in x]
-        
-        # Only add constraint if both courses *could* be scheduled at t
-        if c1_vars and c2_vars:
-            prob += pulp.lpSum(c1_vars) + pulp.lpSum(c2_vars) <= 1, f"Stud_Clash_{c1}_{c2}_{t}"
+model_vars, slot_vars = build_hard_constraints(
+    prob, df_courses, eligible_rooms, room_pools, instructor_map, student_clashes, time_slots,
+    formulation=FORMULATION, room_symmetry=ROOM_SYMMETRY, clash_mode=STUDENT_CLASH_MODE, metrics=metrics,
+)
+print(f"Created {len(model_vars)} binary variables and {len(prob.constraints)} constraints ({FORMULATION}).")
 
 # Objective: Feasibility Only (0)
 prob += 0, "Feasibility_Only"
@@ -145,7 +162,9 @@ prob += 0, "Feasibility_Only"
 
 print("Solving... (This may take longer due to larger dataset)")
 # Using default CBC solver
-prob.solve()
+with phase(metrics, "solve") as rec:
+    prob.solve(pulp.PULP_CBC_CMD(timeLimit=args.time_limit))
+    rec['status'] = pulp.LpStatus[prob.status]
 
 status = pulp.LpStatus[prob.status]
 print(f"Solver Status: {status}")
@@ -155,31 +174,22 @@ print(f"Solver Status: {status}")
 # ==========================================
 
 if status == 'Optimal':
-    results = []
-    
-    for (c, t, r), var in x.items():
-        if var.varValue == 1:
-            day, slot_num = t.split('_')
-            
-            course_row = df_courses[df_courses['course_id'] == c]
-            course_name = course_row['title'].values[0] if not course_row.empty else c
+    with phase(metrics, "export"):
+        # Bulk read of the binaries, titles from a course -> title map
+        results = timetable_entries(solution_assignments(
+            model_vars, FORMULATION, eligible_rooms, room_capacity,
+            room_pools=room_pools if ROOM_SYMMETRY == "pool" else None,
+        ), df_courses)
+        for entry in results:
+            entry['Display'] = f"{entry['Course']} ({entry['Room']})"
             
-            entry = f"{c} ({r})"
-            
-            results.append({
-                'Day': day, 
-                'Slot': int(slot_num), 
-                'Course': c, 
-                'Room': r, 
-                'Title': course_name,
-                'Display': entry
-            })
-            
-    # Export to JSON
-    output_filename = 'new_timetable_output.json'
-    with open(output_filename, 'w') as f:
-        json.dump(results, f, indent=4)
-    print(f"\n[SUCCESS] Timetable generated and saved to {output_filename}")
+        # Export to JSON
+        output_filename = 'new_timetable_output.json'
+        with open(output_filename, 'w') as f:
+            json.dump(results, f, indent=4)
+        if args.columnar:
+            write_columnar(results, columnar_path(output_filename, args.columnar), args.columnar, time_slots)
+        print(f"\n[SUCCESS] Timetable generated and saved to {output_filename}")
     
     # Print simple grid
     df_res = pd.DataFrame(results)
@@ -193,3 +203,5 @@ if status == 'Optimal':
 else:
     print("Could not find a feasible solution.")
     print("Tips: Check if room capacities are large enough for the new student counts.")
+
+close_metrics(metrics, status=status, variables=len(model_vars), constraints=len(prob.constraints))
@@ -1,8 +1,29 @@
 import pandas as pd
 import pulp
 import json
-from io import StringIO
+import os
 import sys
+import argparse
+from formulation import (
+    build_hard_constraints, add_prof_overload, late_slot_weights, late_slot_term,
+    course_slot_vars, apply_warm_start, solution_assignments, timetable_entries,
+)
+from timetable_io import COLUMNAR_FORMATS, columnar_path, write_columnar, parquet_available
+from greedy import greedy_timetable
+from portfolio import default_portfolio, solve_portfolio
+from model_cache import cache_key, file_digest, load_model, store_model
+from solution_cache import solution_key, lookup_solution, is_final, store_solution
+from instrumentation import open_metrics, phase, close_metrics
+from convergence import solver_log_path, convergence_path, echo_log, parse_cbc_log, save_convergence, summarise
+from preprocess import (
+    build_instructor_map, build_room_eligibility, build_clash_graph, build_room_pools, load_enrollments,
+    clash_graph_from_bundles, conflict_neighbours,
+)
+from dataset import DATASET_DIR, load_dataset
+from incremental import (
+    snapshot_path, input_snapshot, save_snapshot, load_snapshot,
+    changed_courses, affected_courses, move_penalty_term, fix_unaffected, release_fixed,
+)
 
 # ==========================================
 # 0. CONFIGURATION (Tunable Weights)
@@ -10,22 +31,134 @@ import sys
 W1_TIME_PENALTY = 5     
 W2_PROF_OVERLOAD = 100  
 PROF_DAILY_LIMIT = 2    
+W3_MOVE_PENALTY = 10    # --incremental only: cost of moving a class away from its previous slot
 SOLVER_TIME_LIMIT = 100  # Stop after 100 seconds (CRITICAL FIX)
+SOLVER_GAP_REL = 0.05    # Stop within 5% of the optimum
+STUDENT_CLASH_MODE = "clique"  # "clique" (tighter LP) or "pairwise"
+FORMULATION = "time_room"      # "time_room" (x[c,t,r]) or "two_stage" (y[c,t], rooms assigned after solve)
+ROOM_SYMMETRY = "pool"         # identical rooms: "pool" (counted resource), "lex" (symmetry breaking) or "none"
+OUTPUT_FILE = 'timetable_output.json'
+INPUT_FILES = ['courses.csv', 'student_data_large.csv', 'rooms.csv']
+USE_MODEL_CACHE = True   # Reload the built constraint system when inputs + structure are unchanged
+USE_SOLUTION_CACHE = True  # Return the stored timetable when inputs, weights and gap are unchanged
+USE_DATASET = True         # Load the binary dataset from dataset.py (recompiled when a CSV changes)
+METRICS_FILE = 'penalty_model_metrics.jsonl'  # Per-phase timing/memory/size JSON lines
+COLUMNAR_OUTPUT = None   # Also write the timetable as "npz" or "parquet" next to the JSON
+
+parser = argparse.ArgumentParser(description="OptiTime penalty (optimization) model")
+start_group = parser.add_mutually_exclusive_group()
+start_group.add_argument('--warm-start', metavar='JSON',
+                         help="existing timetable (e.g. new_timetable_output.json) passed to CBC as a MIP start, "
+                              "or 'greedy' to start from the DSATUR constructor")
+start_group.add_argument('--incremental', action='store_true',
+                         help=f"only re-optimize courses changed since the last solve of {OUTPUT_FILE} "
+                              "(plus their conflict neighbours and the courses sharing their rooms); "
+                              "everything else stays fixed")
+parser.add_argument('--portfolio', type=int, metavar='N', default=0,
+                    help="race N CBC processes (different seeds, threads, cut/heuristic settings) "
+                         "and keep the first optimal or best incumbent")
+parser.add_argument('--time-limit', type=float, default=SOLVER_TIME_LIMIT,
+                    help="solver budget in seconds; a larger budget than a cached time-limited solve re-solves "
+                         "from the cached timetable")
+parser.add_argument('--refresh', action='store_true', help="ignore the solution cache and always solve")
+parser.add_argument('--metrics', metavar='PATH', default=METRICS_FILE,
+                    help="append per-phase metrics as JSON lines to PATH ('-' for stderr, '' to disable)")
+parser.add_argument('--columnar', choices=COLUMNAR_FORMATS, default=COLUMNAR_OUTPUT,
+                    help="also write a compact columnar copy of the timetable next to the JSON")
+args = parser.parse_args()
+if args.columnar == 'parquet' and not parquet_available():
+    parser.error("--columnar parquet needs pyarrow (pip install pyarrow); use --columnar npz instead")
+metrics = open_metrics(args.metrics, 'penalty_model') if args.metrics else None
 
 # ==========================================
 # 1. LOAD DATA 
 # ==========================================
 print("Loading Data...")
 
-try:
-    df_courses = pd.read_csv('courses.csv')
-    df_students = pd.read_csv('student_data_large.csv')
-except FileNotFoundError:
-    print("Error: CSV files not found.")
-    sys.exit(1)
+with phase(metrics, "load") as rec:
+    dataset = None
+    try:
+        if USE_DATASET:
+            dataset = enrollments = load_dataset()
+            df_courses, df_rooms = dataset['df_courses'], dataset['df_rooms']
+            rec['compiled'] = dataset['compiled']
+            if dataset['compiled']:
+                print(f"Compiled the dataset into {DATASET_DIR}.")
+        else:
+            df_courses = pd.read_csv('courses.csv')
+            enrollments = load_enrollments('student_data_large.csv')
+        df_students = enrollments['df_students']
+    except FileNotFoundError:
+        print("Error: CSV files not found.")
+        sys.exit(1)
+
+    # Rooms
+    if dataset is None:
+        df_rooms = pd.read_csv('rooms.csv')
+    rec.update(courses=len(df_courses), enrollments=len(df_students), rooms=len(df_rooms))
+
+# Warm start timetable (optional; incremental runs start from the last solution)
+warm_entries = None
+warm_source = OUTPUT_FILE if args.incremental else args.warm_start
+if warm_source and warm_source != 'greedy':
+    try:
+        with open(warm_source, 'r') as f:
+            warm_entries = json.load(f)
+        previous_snapshot = load_snapshot(snapshot_path(OUTPUT_FILE)) if args.incremental else None
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found." + (" Run a full solve first." if args.incremental else ""))
+        sys.exit(1)
+
+# Snapshot of the inputs, stored next to the timetable for later incremental runs
+with phase(metrics, "input_snapshot"):
+    current_snapshot = input_snapshot(df_courses, df_rooms, df_students)
+
+days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
+slots_per_day = 6 
+time_slots = [f"{d}_{s+1}" for d in days for s in range(slots_per_day)]
 
-# Rooms
-df_rooms = pd.read_csv('rooms.csv')
+# Everything except the objective weights determines the constraint system
+structure = {
+    'days': days, 'slots_per_day': slots_per_day, 'prof_daily_limit': PROF_DAILY_LIMIT,
+    'formulation': FORMULATION, 'room_symmetry': ROOM_SYMMETRY, 'clash_mode': STUDENT_CLASH_MODE,
+}
+
+# --- SOLUTION CACHE ---
+# Incremental runs depend on the previous timetable, so they always solve
+use_solution_cache = USE_SOLUTION_CACHE and not args.incremental
+solution_cache_key = None
+if use_solution_cache:
+    # The effective solver configuration: a different portfolio or MIP start can find a different timetable
+    solver_config = {
+        'gap_rel': SOLVER_GAP_REL,
+        'portfolio': default_portfolio(args.portfolio) if args.portfolio else None,
+        'warm_start': file_digest(warm_source) if warm_source not in (None, 'greedy') else warm_source,
+        'incremental': args.incremental,
+    }
+    solution_cache_key = solution_key(
+        INPUT_FILES, structure, {'w_time': W1_TIME_PENALTY, 'w_overload': W2_PROF_OVERLOAD}, solver_config,
+    )
+    with phase(metrics, "solution_cache") as rec:
+        cached_solution = None if args.refresh else lookup_solution(solution_cache_key)
+        rec['hit'] = cached_solution is not None
+    if cached_solution is not None and is_final(cached_solution, args.time_limit):
+        with open(OUTPUT_FILE, 'w') as f:
+            json.dump(cached_solution['timetable'], f, indent=4)
+        if args.columnar:
+            write_columnar(cached_solution['timetable'], columnar_path(OUTPUT_FILE, args.columnar),
+                           args.columnar, time_slots)
+        save_snapshot(snapshot_path(OUTPUT_FILE), current_snapshot)
+        print(f"Solution cache hit ({solution_cache_key[:12]}): {cached_solution['status']} timetable "
+              f"from {cached_solution['solved_at']} ({cached_solution['time_limit']:g}s budget).")
+        print(f"Success! Saved solution (Objective: {cached_solution['objective']})")
+        close_metrics(metrics, status=cached_solution['status'], objective=cached_solution['objective'], cached=True)
+        sys.exit(0)
+    if cached_solution is not None and warm_source is None:
+        # Time-limited entry and a bigger budget now: continue from it
+        print(f"Solution cache: improving on a {cached_solution['status']} timetable "
+              f"({cached_solution['time_limit']:g}s budget, objective {cached_solution['objective']}).")
+        warm_entries = cached_solution['timetable']
+        warm_source = 'solution cache'
 
 # ==========================================
 # 2. PRE-PROCESSING
@@ -33,134 +166,189 @@ df_rooms = pd.read_csv('rooms.csv')
 print("Preprocessing Constraints...")
 
 # Instructor Map
-instructor_map = {} 
-for idx, row in df_courses.iterrows():
-    cid = row['course_id']
-    instructors = [row['instructor1'], row['instructor2']]
-    for inst in instructors:
-        if pd.notna(inst):
-            if inst not in instructor_map: instructor_map[inst] = []
-            instructor_map[inst].append(cid)
-
-# Student Conflicts
-student_clashes = set() 
-student_groups = df_students.groupby('student_id')['course_id'].apply(list)
-for _, taken in student_groups.items():
-    taken = sorted(list(set(taken))) 
-    for i in range(len(taken)):
-        for j in range(i + 1, len(taken)):
-            student_clashes.add((taken[i], taken[j]))
-
-enrollment = df_students.groupby('course_id').size().to_dict()
+with phase(metrics, "instructor_map"):
+    instructor_map = dataset['instructor_map'] if dataset else build_instructor_map(df_courses)
 
-days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
-slots_per_day = 6 
-time_slots = [f"{d}_{s+1}" for d in days for s in range(slots_per_day)]
+# Student Conflicts: (c1, c2) -> number of shared students
+with phase(metrics, "clash_graph") as rec:
+    student_clashes = clash_graph_from_bundles(*dataset['bundles']) if dataset else build_clash_graph(df_students)
+    rec['clash_pairs'] = len(student_clashes)
+
+with phase(metrics, "enrollment"):
+    enrollment = enrollments['enrollment']
+
+# Course -> Eligible Rooms (capacity + lab/lecture room type)
+with phase(metrics, "room_eligibility"):
+    eligible_rooms = build_room_eligibility(df_courses, df_rooms, enrollment)
+
+# Pools of interchangeable rooms (same capacity + lab flag)
+with phase(metrics, "room_pools"):
+    room_pools = build_room_pools(df_rooms)
 
 # Slot Weights (Time Penalty)
-slot_weights = {}
-for t in time_slots:
-    day, num = t.split('_')
-    slot_weights[t] = (int(num) - 1) * W1_TIME_PENALTY
+slot_weights = late_slot_weights(time_slots, W1_TIME_PENALTY)
+
+# Incremental: courses to re-optimize
+if args.incremental:
+    changed = changed_courses(previous_snapshot, current_snapshot, warm_entries)
+    neighbours = conflict_neighbours(
+        {'df_courses': df_courses, 'student_clashes': student_clashes, 'instructor_map': instructor_map}
+    )
+    free_courses = affected_courses(changed, neighbours, warm_entries)
+    print(f"Incremental: {len(changed)} changed courses, re-optimizing {len(free_courses)} "
+          f"(with conflict and room neighbours) of {len(df_courses)}.")
+
+# Greedy warm start: DSATUR constructor on the structures above
+if warm_source == 'greedy':
+    with phase(metrics, "greedy_start"):
+        greedy_assignments, _ = greedy_timetable({
+            'df_courses': df_courses, 'instructor_map': instructor_map, 'student_clashes': student_clashes,
+            'eligible_rooms': eligible_rooms, 'room_capacity': df_rooms.set_index('room')['capacity'].to_dict(),
+            'days': days, 'time_slots': time_slots,
+        }, PROF_DAILY_LIMIT)
+        warm_entries = timetable_entries(greedy_assignments, df_courses)
 
 # ==========================================
 # 3. BUILD MODEL
 # ==========================================
 print("Building MILP Model with Objectives...")
-prob = pulp.LpProblem("OptiTime_Advanced", pulp.LpMinimize)
-
-course_ids = df_courses['course_id'].tolist()
-room_ids = df_rooms['room'].tolist()
-
-# --- VARIABLES ---
-x = {} 
-for c in course_ids:
-    req = enrollment.get(c, 0)
-    for t in time_slots:
-        for r in room_ids:
-            r_cap = df_rooms.loc[df_rooms['room'] == r, 'capacity'].values[0]
-            if r_cap >= req:
-                is_lab = 'Lab' in str(df_courses.loc[df_courses['course_id']==c, 'title'].values[0])
-                is_lab_room = 'R-' in r
-                if is_lab != is_lab_room: continue
-                x[(c, t, r)] = pulp.LpVariable(f"x_{c}_{t}_{r}", cat='Binary')
-
-# --- HARD CONSTRAINTS ---
-print("Adding Hard Constraints...")
-
-# Slot Requirements
-for idx, row in df_courses.iterrows():
-    c = row['course_id']
-    prob += pulp.lpSum([x.get((c, t, r), 0) for t in time_slots for r in room_ids]) == row['slots_required']
-
-# Room Conflict
-for t in time_slots:
-    for r in room_ids:
-        prob += pulp.lpSum([x.get((c, t, r), 0) for c in course_ids]) <= 1
-
-# Instructor Conflict
-for inst, c_list in instructor_map.items():
-    for t in time_slots:
-        prob += pulp.lpSum([x.get((c, t, r), 0) for c in c_list for r in room_ids]) <= 1
-
-# Student Clashes
-for (c1, c2) in student_clashes:
-    for t in time_slots:
-        c1_vars = [x[(c1, t, r)] for r in room_ids if (c1, t, r) in x]
-        c2_vars = [x[(c2, t, r)] for r in room_ids if (c2, t, r) in x]
-        if c1_vars and c2_vars:
-            prob += pulp.lpSum(c1_vars) + pulp.lpSum(c2_vars) <= 1
+
+room_capacity = df_rooms.set_index('room')['capacity'].to_dict()
+
+with phase(metrics, "model_cache") as rec:
+    model_key = cache_key(INPUT_FILES, structure) if USE_MODEL_CACHE else None
+    cached = load_model(model_key, "OptiTime_Advanced") if USE_MODEL_CACHE else None
+    rec['hit'] = cached is not None
+
+if cached is not None:
+    print(f"Model cache hit ({model_key[:12]}): reloaded constraint system.")
+    prob, model_vars, overload_vars = cached
+    if FORMULATION == "two_stage":
+        slot_vars = {key: [var] for key, var in model_vars.items()}
+    else:
+        slot_vars = course_slot_vars(model_vars)
+else:
+    prob = pulp.LpProblem("OptiTime_Advanced", pulp.LpMinimize)
+
+    # --- VARIABLES & HARD CONSTRAINTS ---
+    # Slot Requirements, Room Conflict, Instructor Conflict, Student Clashes
+    print("Adding Hard Constraints...")
+    model_vars, slot_vars = build_hard_constraints(
+        prob, df_courses, eligible_rooms, room_pools, instructor_map, student_clashes, time_slots,
+        formulation=FORMULATION, room_symmetry=ROOM_SYMMETRY, clash_mode=STUDENT_CLASH_MODE, metrics=metrics,
+    )
+
+    # Prof Overload rows: daily_load <= PROF_DAILY_LIMIT + excess (excess is penalised below)
+    with phase(metrics, "constraints.prof_overload", prob) as rec:
+        overload_vars = add_prof_overload(prob, slot_vars, instructor_map, days, time_slots, PROF_DAILY_LIMIT)
+        rec['variables'] = len(overload_vars)
+
+    if USE_MODEL_CACHE:
+        with phase(metrics, "model_cache_store"):
+            store_model(model_key, prob, model_vars, overload_vars)
+
+# --- WARM START ---
+if warm_entries is not None:
+    with phase(metrics, "warm_start") as rec:
+        mapped = apply_warm_start(
+            model_vars, slot_vars, FORMULATION, warm_entries,
+            room_pools=room_pools if ROOM_SYMMETRY == "pool" else None,
+        )
+        rec['mapped'] = mapped
+    print(f"Warm start: mapped {mapped}/{len(warm_entries)} classes from '{warm_source}'.")
+
+if args.incremental:
+    fixed = fix_unaffected(model_vars, free_courses)
+    print(f"Incremental: fixed {fixed} variables of unchanged courses.")
 
 # --- SOFT CONSTRAINTS ---
 print("Adding Objective Functions...")
 
-# Term 1: Late Slots
-obj_time = pulp.lpSum([x[key] * slot_weights[key[1]] for key in x])
+with phase(metrics, "objective"):
+    # Term 1: Late Slots
+    obj_time = late_slot_term(slot_vars, slot_weights)
+
+    # Term 2: Prof Overload (excess variables created with the hard constraints)
 
-# Term 2: Prof Overload
-overload_vars = []
-for inst, c_list in instructor_map.items():
-    if inst == 'TBD': continue 
-    for d in days:
-        day_slots = [s for s in time_slots if s.startswith(d)]
-        daily_load = pulp.lpSum([x.get((c, t, r), 0) for c in c_list for t in day_slots for r in room_ids])
-        excess = pulp.LpVariable(f"excess_{inst}_{d}", lowBound=0)
-        prob += daily_load <= PROF_DAILY_LIMIT + excess
-        overload_vars.append(excess)
+    # Term 3 (incremental only): Moved classes
+    obj_moves = move_penalty_term(model_vars, free_courses) if args.incremental else 0
 
-prob += obj_time + (W2_PROF_OVERLOAD * pulp.lpSum(overload_vars))
+    prob.setObjective(obj_time + (W2_PROF_OVERLOAD * pulp.lpSum(overload_vars)) + (W3_MOVE_PENALTY * obj_moves))
 
 # ==========================================
 # 4. SOLVE (WITH TIME LIMIT)
 # ==========================================
-print(f"Solving with {SOLVER_TIME_LIMIT}s time limit...")
+print(f"Solving with {args.time_limit:g}s time limit...")
 
 # --- CRITICAL CHANGE HERE ---
 # We use PULP_CBC_CMD to pass specific arguments to the solver binary
 # timeLimit: Max seconds to run
 # gapRel: Stop if the solution is within 5% (0.05) of the mathematical optimum
-solver = pulp.PULP_CBC_CMD(msg=True, timeLimit=SOLVER_TIME_LIMIT, gapRel=0.05)
-prob.solve(solver)
+# warmStart: pass the initial values set above to CBC as a MIP start
+# logPath: CBC's progress goes to a log file (echoed to the console while it runs),
+#          parsed afterwards into the convergence time series
+SOLVER_LOG = solver_log_path(OUTPUT_FILE)
+solver = pulp.PULP_CBC_CMD(msg=False, timeLimit=args.time_limit, gapRel=SOLVER_GAP_REL,
+                           warmStart=warm_entries is not None, logPath=SOLVER_LOG)
+with phase(metrics, "solve") as rec:
+    if args.portfolio:
+        # Same limits, but N differently configured CBC processes race on all cores
+        winner = solve_portfolio(prob, default_portfolio(args.portfolio), args.time_limit,
+                                 gap_rel=SOLVER_GAP_REL, warm_start=warm_entries is not None, log_path=SOLVER_LOG)
+        print(f"Portfolio winner: {winner}")
+        rec['portfolio_winner'] = winner
+    else:
+        with echo_log(SOLVER_LOG):
+            prob.solve(solver)
+    rec['status'] = pulp.LpStatus[prob.status]
 
 status = pulp.LpStatus[prob.status]
 print(f"Status: {status}")
 
+if args.incremental and status not in ['Optimal', 'Feasible']:
+    # The change cannot be absorbed locally: release everything and re-solve from the old timetable
+    print("Incremental re-solve failed; falling back to a full solve...")
+    release_fixed(model_vars)
+    with phase(metrics, "solve_fallback") as rec, echo_log(SOLVER_LOG):
+        prob.solve(solver)
+        rec['status'] = pulp.LpStatus[prob.status]
+    status = pulp.LpStatus[prob.status]
+    print(f"Status: {status}")
+
+# --- CONVERGENCE ---
+# Incumbent / bound / gap / nodes over time, next to the timetable
+if os.path.exists(SOLVER_LOG):
+    with open(SOLVER_LOG, 'r') as f:
+        conv_points, conv_final = parse_cbc_log(f.read())
+    save_convergence(convergence_path(OUTPUT_FILE), conv_points, conv_final,
+                     time_limit=args.time_limit, gap_rel=SOLVER_GAP_REL, status=status,
+                     portfolio_winner=winner if args.portfolio else None)
+    print(f"Convergence: {summarise(conv_points, conv_final)} (saved to {convergence_path(OUTPUT_FILE)})")
+
 # ==========================================
 # 5. EXPORT
 # ==========================================
 if status in ['Optimal', 'Feasible']: # Note: Status might be 'Feasible' if time ran out but solution exists
-    results = []
-    for (c, t, r), var in x.items():
-        if var.varValue == 1:
-            day, slot_num = t.split('_')
-            course_row = df_courses[df_courses['course_id'] == c]
-            course_name = course_row['title'].values[0] if not course_row.empty else c
-            results.append({
-                'Day': day, 'Slot': int(slot_num), 'Course': c, 'Room': r, 'Title': course_name
-            })
+    with phase(metrics, "export"):
+        # Bulk read of the binaries, titles from a course -> title map
+        results = timetable_entries(solution_assignments(
+            model_vars, FORMULATION, eligible_rooms, room_capacity,
+            room_pools=room_pools if ROOM_SYMMETRY == "pool" else None,
+            previous_entries=warm_entries,
+        ), df_courses)
             
-    with open('timetable_output.json', 'w') as f:
-        json.dump(results, f, indent=4)
+        with open(OUTPUT_FILE, 'w') as f:
+            json.dump(results, f, indent=4)
+        if args.columnar:
+            write_columnar(results, columnar_path(OUTPUT_FILE, args.columnar), args.columnar, time_slots)
+        save_snapshot(snapshot_path(OUTPUT_FILE), current_snapshot)
+        if use_solution_cache:
+            # PuLP reports a time-limited incumbent as 'Optimal'; sol_status tells them apart
+            solved_status = 'Optimal' if prob.sol_status == pulp.LpSolutionOptimal else 'Feasible'
+            store_solution(solution_cache_key, solved_status, pulp.value(prob.objective), args.time_limit, results)
     print(f"Success! Saved solution (Objective: {pulp.value(prob.objective)})")
 else:
     print("No feasible solution found within the time limit.")
+
+close_metrics(metrics, status=status, objective=pulp.value(prob.objective),
+              variables=len(model_vars) + len(overload_vars), constraints=len(prob.constraints))
@@ -0,0 +1,167 @@
+import os
+import queue
+import signal
+import threading
+import time
+import multiprocessing as mp
+import pulp
+
+# ==========================================
+# PARALLEL SOLVER PORTFOLIO
+# ==========================================
+# Races several CBC configurations (random seed, thread count, cut and
+# heuristic settings) on the same model, one process each. The first run
+# that proves optimality (within gapRel) wins and the others are killed;
+# otherwise the best incumbent at the deadline is kept.
+#
+# Workers are forked, so the calling script (penalty_model.py has no
+# __main__ guard) is not re-imported in the child as it would be under
+# spawn. Where fork does not exist (Windows) the runs are threads instead:
+# each still solves in its own CBC process, but losing runs are not killed
+# and stop at the time limit.
+
+# Variations cycled through by default_portfolio(); each is a list of CBC options
+PORTFOLIO_SETTINGS = [
+    [],
+    ["cuts root"],
+    ["heur off", "cuts on"],
+    ["feas on", "proximity on"],
+    ["cuts off"],
+]
+
+
+def default_portfolio(n_workers=None, total_threads=None):
+    """
+    One config per worker: a different seed and CBC setting each, with the
+    available cores split evenly between workers.
+    """
+    total_threads = total_threads or os.cpu_count() or 1
+    n_workers = max(1, n_workers or total_threads)
+    threads = max(1, total_threads // n_workers)
+    configs = []
+    for i in range(n_workers):
+        setting = PORTFOLIO_SETTINGS[i % len(PORTFOLIO_SETTINGS)]
+        configs.append({
+            'name': f"cbc#{i}[{', '.join(setting) or 'default'}]",
+            'threads': threads,
+            'options': [f"randomCbcSeed {1000 + i}", f"randomSeed {1000 + i}"] + setting,
+        })
+    return configs
+
+
+def _run_config(problem_dict, config, time_limit, gap_rel, warm_start, results, log_path=None, own_group=True):
+    # Own process group, so killing the worker also kills its CBC child
+    if own_group and hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    _, prob = pulp.LpProblem.fromDict(problem_dict)
+    solver = pulp.PULP_CBC_CMD(
+        msg=False, timeLimit=time_limit, gapRel=gap_rel, threads=config['threads'],
+        options=config['options'], warmStart=warm_start, logPath=log_path,
+    )
+    try:
+        prob.solve(solver)
+    except pulp.PulpSolverError as e:
+        results.put((config['name'], None, None, None, str(e)))
+        return
+    values = {v.name: v.varValue for v in prob.variables()}
+    results.put((config['name'], prob.status, prob.sol_status, pulp.value(prob.objective), values))
+
+
+def _kill(proc):
+    if isinstance(proc, threading.Thread) or not proc.is_alive():
+        return
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        proc.terminate()
+
+
+def solve_portfolio(prob, configs, time_limit, gap_rel=None, warm_start=False, verbose=True, log_path=None):
+    """
+    Solve prob with every config in parallel. On return prob carries the
+    winning solution and status, like after prob.solve(). Returns the
+    winning config name (None if no run found a solution).
+    With log_path, every run logs to log_path.<i> and the winner's log is
+    moved to log_path; without a winner log_path does not exist afterwards.
+    """
+    if log_path and os.path.exists(log_path):
+        os.remove(log_path)   # an earlier run's log must not pass for this one
+    problem_dict = prob.toDict()
+    log_paths = {cfg['name']: f"{log_path}.{i}" if log_path else None for i, cfg in enumerate(configs)}
+    if 'fork' in mp.get_all_start_methods():
+        ctx = mp.get_context('fork')
+        results = ctx.Queue()
+        procs = {
+            cfg['name']: ctx.Process(target=_run_config, daemon=True, args=(
+                problem_dict, cfg, time_limit, gap_rel, warm_start, results, log_paths[cfg['name']]))
+            for cfg in configs
+        }
+    else:
+        results = queue.Queue()
+        procs = {
+            cfg['name']: threading.Thread(target=_run_config, daemon=True, args=(
+                problem_dict, cfg, time_limit, gap_rel, warm_start, results, log_paths[cfg['name']], False))
+            for cfg in configs
+        }
+    for p in procs.values():
+        p.start()
+
+    # Workers stop on their own at time_limit; allow a little slack for I/O
+    deadline = time.time() + time_limit + 10
+    best = None
+    pending = set(procs)
+    dead_since = {}
+    while pending and time.time() < deadline:
+        try:
+            name, status, sol_status, objective, values = results.get(timeout=0.5)
+        except queue.Empty:
+            # A worker that exited without posting (crashed, killed) will never report;
+            # its result may still be in flight for a moment after it exits
+            now = time.time()
+            for name in [n for n in pending if not procs[n].is_alive()]:
+                if now - dead_since.setdefault(name, now) > 1:
+                    pending.discard(name)
+                    if verbose:
+                        code = getattr(procs[name], 'exitcode', None)
+                        print(f"[Portfolio] {name}: worker exited without a result (exit code {code})")
+            continue
+        pending.discard(name)
+        if status is None:
+            if verbose: print(f"[Portfolio] {name}: solver error ({values})")
+            continue
+        if verbose:
+            print(f"[Portfolio] {name}: {pulp.LpStatus[status]}, objective {objective}")
+        if sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+            continue
+        if best is None or objective < best[3]:
+            best = (name, status, sol_status, objective, values)
+        if sol_status == pulp.LpSolutionOptimal:
+            break
+
+    for p in procs.values():
+        _kill(p)
+    for p in procs.values():
+        p.join(timeout=1)
+
+    if log_path:
+        for name, path in log_paths.items():
+            if not os.path.exists(path):
+                continue
+            if best is not None and name == best[0]:
+                os.replace(path, log_path)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:   # a thread worker's CBC may still hold it open (Windows)
+                    pass
+
+    if best is None:
+        prob.assignStatus(pulp.LpStatusNotSolved)
+        return None
+    name, status, sol_status, objective, values = best
+    prob.assignVarsVals(values)
+    prob.assignStatus(status, sol_status)
+    return name
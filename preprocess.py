@@ -0,0 +1,320 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# ==========================================
+# SHARED PRE-PROCESSING
+# ==========================================
+# Structures used by both new_model.py and penalty_model.py.
+# Everything here is built once per run so that model building only
+# does plain dict lookups.
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri']
+SLOTS_PER_DAY = 6
+ENROLLMENT_FILE = 'student_data_large.csv'
+ENROLLMENT_CHUNK_ROWS = 500_000
+
+
+def make_time_slots(days=DAYS, slots_per_day=SLOTS_PER_DAY):
+    return [f"{d}_{s+1}" for d in days for s in range(slots_per_day)]
+
+
+def load_enrollments(path=ENROLLMENT_FILE, names=False, chunk_size=ENROLLMENT_CHUNK_ROWS):
+    """
+    Stream the enrollment CSV in chunks, keeping only student_id and course_id
+    as integer codes (student_name only with names=True, stored once per
+    student instead of once per row). Returns a dict:
+      'df_students'      DataFrame(student_id, course_id), both categorical,
+                         a drop-in for pd.read_csv(path)[['student_id', 'course_id']]
+      'enrollment'       {course_id: enrollment rows}, counted during the pass
+      'students'/'courses'   code -> id (sorted pd.Index)
+      'student_names'    code -> name array (names=True only)
+      'student_ptr'/'student_courses'
+                         per-student course lists as CSR arrays: the course
+                         codes of student k are student_courses[ptr[k]:ptr[k+1]]
+                         (file order, duplicates dropped)
+    """
+    student_code, course_code = {}, {}
+    student_names = []
+    s_parts, c_parts = [], []
+    counts = np.zeros(0, dtype=np.int64)
+    usecols = ['student_id', 'course_id'] + (['student_name'] if names else [])
+
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_size):
+        # Factorise the chunk, then translate its local codes to global ones
+        s_local, s_uniques = pd.factorize(chunk['student_id'])
+        c_local, c_uniques = pd.factorize(chunk['course_id'])
+        known = len(student_code)
+        s_map = np.array([student_code.setdefault(s, len(student_code)) for s in s_uniques.tolist()], dtype=np.int32)
+        c_map = np.array([course_code.setdefault(c, len(course_code)) for c in c_uniques.tolist()], dtype=np.int32)
+        if names:
+            _, first_row = np.unique(s_local, return_index=True)
+            new = s_map >= known
+            student_names.extend(chunk['student_name'].to_numpy()[first_row[new]])
+        s_codes, c_codes = s_map[s_local], c_map[c_local]
+        s_parts.append(s_codes)
+        c_parts.append(c_codes)
+        chunk_counts = np.bincount(c_codes, minlength=len(course_code))
+        chunk_counts[:len(counts)] += counts
+        counts = chunk_counts
+
+    s = np.concatenate(s_parts) if s_parts else np.zeros(0, dtype=np.int32)
+    c = np.concatenate(c_parts) if c_parts else np.zeros(0, dtype=np.int32)
+    # Sorted category tables, so categorical ordering (groupby, sort_values,
+    # factorize(sort=True)) matches the plain string columns
+    students, s, s_order = _sorted_codes(student_code, s, 'student_id')
+    courses, c, c_order = _sorted_codes(course_code, c, 'course_id')
+    counts = counts[c_order]
+
+    # CSR per-student course lists: first row of every (student, course) pair, grouped by student
+    key = s.astype(np.int64) * max(len(courses), 1) + c
+    _, first = np.unique(key, return_index=True)
+    first.sort()
+    order = first[np.argsort(s[first], kind='stable')]
+    student_ptr = np.zeros(len(students) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(s[order], minlength=len(students)), out=student_ptr[1:])
+
+    enrollments = {
+        'df_students': pd.DataFrame({
+            'student_id': pd.Categorical.from_codes(s, categories=students),
+            'course_id': pd.Categorical.from_codes(c, categories=courses),
+        }),
+        'enrollment': {cid: int(n) for cid, n in zip(courses, counts)},
+        'students': students,
+        'courses': courses,
+        'student_ptr': student_ptr,
+        'student_courses': c[order],
+    }
+    if names:
+        enrollments['student_names'] = np.array(student_names, dtype=object)[s_order]
+    return enrollments
+
+
+def _sorted_codes(code_of, codes, name):
+    """Sort the id table of code_of and renumber codes to match. Returns (ids, codes, order)."""
+    ids = pd.Index(list(code_of), name=name)
+    order = ids.argsort()
+    remap = np.empty(len(order), dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    return ids[order], remap[codes], order
+
+
+def student_course_lists(enrollments):
+    """{student_id: [course ids]} from the CSR arrays of load_enrollments()."""
+    ptr, codes, courses = enrollments['student_ptr'], enrollments['student_courses'], enrollments['courses']
+    return {sid: courses[codes[ptr[k]:ptr[k + 1]]].tolist() for k, sid in enumerate(enrollments['students'])}
+
+
+def build_instructor_map(df_courses):
+    """Map instructor name -> list of course ids they teach."""
+    instructor_map = {}
+    for cid, inst1, inst2 in df_courses[['course_id', 'instructor1', 'instructor2']].itertuples(index=False):
+        for inst in (inst1, inst2):
+            if pd.notna(inst):
+                instructor_map.setdefault(inst, []).append(cid)
+    return instructor_map
+
+
+def is_lab_course(title):
+    return 'Lab' in str(title)
+
+
+def is_lab_room(room):
+    return 'R-' in room
+
+
+def build_room_eligibility(df_courses, df_rooms, enrollment_counts):
+    """
+    Map course id -> list of rooms it may use.
+
+    A room is eligible if its capacity covers the course enrollment and its
+    type matches the course (lab courses in 'R-' rooms, lectures elsewhere).
+    Room order follows rooms.csv.
+    """
+    rooms = list(df_rooms[['room', 'capacity']].itertuples(index=False, name=None))
+    room_is_lab = {r: is_lab_room(r) for r, _ in rooms}
+
+    eligible_rooms = {}
+    for cid, title in df_courses[['course_id', 'title']].itertuples(index=False):
+        req = enrollment_counts.get(cid, 0)
+        lab = is_lab_course(title)
+        eligible_rooms[cid] = [r for r, cap in rooms if cap >= req and room_is_lab[r] == lab]
+    return eligible_rooms
+
+
+def course_bundles(df_students):
+    """
+    Collapse students taking the exact same set of courses (e.g. a whole
+    cohort) into bundles. Returns (course_ids, bundle_ptr, bundle_courses,
+    bundle_sizes): bundle b is taken by bundle_sizes[b] students and holds
+    the sorted course codes bundle_courses[bundle_ptr[b]:bundle_ptr[b + 1]],
+    which index into course_ids.
+    """
+    enrol = df_students[['student_id', 'course_id']].drop_duplicates()
+    if enrol.empty:
+        return [], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    course_codes, course_ids = pd.factorize(enrol['course_id'], sort=True)
+    enrol = enrol.assign(code=course_codes)
+
+    bundles = enrol.groupby('student_id', sort=False, observed=True)['code'].apply(lambda s: tuple(sorted(s)))
+    bundle_sizes = bundles.value_counts(sort=False)
+
+    bundle_ptr = np.zeros(len(bundle_sizes) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in bundle_sizes.index], out=bundle_ptr[1:])
+    bundle_courses = np.fromiter((c for b in bundle_sizes.index for c in b), dtype=np.int64, count=bundle_ptr[-1])
+    return list(course_ids), bundle_ptr, bundle_courses, bundle_sizes.to_numpy(dtype=np.int64)
+
+
+def clash_graph_from_bundles(course_ids, bundle_ptr, bundle_courses, bundle_sizes):
+    """
+    Weighted course clash graph {(c1, c2): shared_students} with c1 < c2:
+    the sparse product B^T W B of the bundle x course incidence matrix B,
+    with bundle sizes W on the diagonal.
+    """
+    if not len(bundle_sizes):
+        return {}
+    lengths = np.diff(bundle_ptr)
+    rows = np.repeat(np.arange(len(bundle_sizes)), lengths)
+    cols = np.asarray(bundle_courses, dtype=np.int64)
+    sizes = np.repeat(np.asarray(bundle_sizes, dtype=np.int64), lengths)
+    shape = (len(bundle_sizes), len(course_ids))
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=shape)
+    weighted = sparse.csr_matrix((sizes, (rows, cols)), shape=shape)
+
+    co_enrol = sparse.triu(incidence.T @ weighted, k=1).tocoo()
+    order = np.lexsort((co_enrol.col, co_enrol.row))
+    return {
+        (course_ids[i], course_ids[j]): int(w)
+        for i, j, w in zip(co_enrol.row[order], co_enrol.col[order], co_enrol.data[order])
+    }
+
+
+def build_clash_graph(df_students):
+    """
+    Weighted course clash graph: {(c1, c2): shared_students} with c1 < c2.
+
+    Students taking the exact same set of courses are collapsed into one
+    bundle first (course_bundles), then the graph is computed from the
+    bundles (clash_graph_from_bundles).
+    """
+    return clash_graph_from_bundles(*course_bundles(df_students))
+
+
+def clash_cliques(student_clashes):
+    """
+    Cover every edge of the clash graph with maximal cliques.
+
+    Edges are taken heaviest first; each uncovered edge seeds a clique that
+    is grown greedily (preferring members that cover the most uncovered
+    edges) until it is maximal. Returns a list of sorted course-id lists.
+    """
+    neighbours = {}
+    for c1, c2 in student_clashes:
+        neighbours.setdefault(c1, set()).add(c2)
+        neighbours.setdefault(c2, set()).add(c1)
+
+    # uncovered[c]: neighbours of c whose edge to c is not in a clique yet
+    uncovered = {c: set(nbrs) for c, nbrs in neighbours.items()}
+    cliques = []
+    for c1, c2 in sorted(student_clashes, key=lambda e: (-student_clashes[e], e)):
+        if c2 not in uncovered[c1]:
+            continue
+        clique = [c1, c2]
+        candidates = neighbours[c1] & neighbours[c2]
+        # gain[c]: uncovered edges from c to the clique, updated as members are added
+        gain = dict.fromkeys(candidates, 0)
+        for m in clique:
+            for c in candidates & uncovered[m]:
+                gain[c] += 1
+        while candidates:
+            best = min(candidates, key=lambda c: (-gain[c], c))   # ties: smallest id
+            clique.append(best)
+            candidates &= neighbours[best]
+            for c in candidates & uncovered[best]:
+                gain[c] += 1
+        clique.sort()
+        for m in clique:
+            uncovered[m].difference_update(clique)
+        cliques.append(clique)
+    return cliques
+
+
+def build_room_pools(df_rooms):
+    """
+    Group interchangeable rooms: same capacity and same lab/lecture type.
+    Returns {representative_room: [member rooms]} in rooms.csv order.
+    """
+    pools = {}
+    by_key = {}
+    for r, cap in df_rooms[['room', 'capacity']].itertuples(index=False):
+        key = (cap, is_lab_room(r))
+        if key not in by_key:
+            by_key[key] = r
+            pools[r] = []
+        pools[by_key[key]].append(r)
+    return pools
+
+
+def pool_eligibility(eligible_rooms, room_pools):
+    """Rewrite course -> eligible rooms as course -> eligible room pools."""
+    rep_of = {r: rep for rep, members in room_pools.items() for r in members}
+    return {c: list(dict.fromkeys(rep_of[r] for r in rooms)) for c, rooms in eligible_rooms.items()}
+
+
+def conflict_neighbours(instance):
+    """course -> set of courses it may never share a slot with (shared students or instructor)."""
+    neighbours = {c: set() for c in instance['df_courses']['course_id']}
+    for c1, c2 in instance['student_clashes']:
+        neighbours[c1].add(c2)
+        neighbours[c2].add(c1)
+    for c_list in instance['instructor_map'].values():
+        for c1 in c_list:
+            neighbours[c1].update(c for c in c_list if c != c1)
+    return neighbours
+
+
+def conflict_components(instance):
+    """Connected components of the student + instructor conflict graph (lists of course ids)."""
+    neighbours = conflict_neighbours(instance)
+    seen = set()
+    components = []
+    for start in instance['df_courses']['course_id']:
+        if start in seen:
+            continue
+        stack, comp = [start], []
+        seen.add(start)
+        while stack:
+            c = stack.pop()
+            comp.append(c)
+            for n in neighbours[c]:
+                if n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+        components.append(sorted(comp))
+    return components
+
+
+def prepare_instance(df_courses, df_rooms, df_students, days=DAYS, slots_per_day=SLOTS_PER_DAY, enrollment=None,
+                     student_clashes=None):
+    """
+    Run every pre-processing step at once. Used by the tools that build
+    models programmatically (LNS, benchmarks, ...); returns a dict.
+    enrollment / student_clashes: precomputed counts (load_enrollments()['enrollment'])
+    and clash graph (e.g. from the dataset's course bundles), if any.
+    """
+    if enrollment is None:
+        enrollment = df_students.groupby('course_id', observed=True).size().to_dict()
+    return {
+        'df_courses': df_courses,
+        'df_rooms': df_rooms,
+        'df_students': df_students,
+        'enrollment': enrollment,
+        'instructor_map': build_instructor_map(df_courses),
+        'eligible_rooms': build_room_eligibility(df_courses, df_rooms, enrollment),
+        'room_pools': build_room_pools(df_rooms),
+        'room_capacity': df_rooms.set_index('room')['capacity'].to_dict(),
+        'student_clashes': student_clashes if student_clashes is not None else build_clash_graph(df_students),
+        'days': list(days),
+        'time_slots': make_time_slots(days, slots_per_day),
+    }
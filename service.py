@@ -0,0 +1,500 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+import pulp
+from dataset import load_dataset
+from preprocess import prepare_instance, build_room_eligibility, clash_graph_from_bundles, student_course_lists
+from formulation import build_penalty_model, add_student_clash_constraints, solution_assignments, timetable_entries
+from convergence import parse_cbc_log, summarise
+
+# ==========================================
+# 0. CONFIGURATION
+# ==========================================
+HOST = '127.0.0.1'
+PORT = 8765
+WORKERS = 2              # Solves running at the same time (one CBC process each)
+W1_TIME_PENALTY = 5
+W2_PROF_OVERLOAD = 100
+PROF_DAILY_LIMIT = 2
+SOLVER_TIME_LIMIT = 60   # Default per job
+SOLVER_GAP_REL = 0.05
+JOB_HISTORY = 200        # Finished jobs kept for GET /jobs/<id>
+
+# ==========================================
+# Local scheduling service.
+# The data and the PuLP model are built once and stay in memory; edits are
+# applied to that model instead of rebuilding it:
+#   set_room_capacity   upper bounds of the room's x[c, t, r] (a closed room is capacity 0)
+#   add/remove_enrollment   enrollment counts -> room bounds of the course; a
+#                       course pair gaining its first shared student gets
+#                       pairwise Stud_Clash rows, and a pair losing its last one
+#                       drops them (or, if a clique row covered it, the clique
+#                       rows are regenerated -- the only partial rebuild)
+#   pin / unpin         a 'Pin_<course>_<slot>' row forcing the class into that slot (and room)
+# To make every edit a bound or row change, the model is built with x
+# variables for every room of the right type (capacity only sets bounds) and
+# unpooled rooms (ROOM_SYMMETRY "none": pools depend on capacities).
+#
+# Jobs (POST /jobs) carry their own edits: under the model lock a job
+# applies them, writes the model as MPS and, unless persist=true, reverts
+# them. CBC then runs outside the lock, so WORKERS jobs solve concurrently
+# on one model. Results are read from CBC's solution file, never from the
+# shared variables.
+# ==========================================
+
+FORMULATION = "time_room"
+ROOM_SYMMETRY = "none"
+STUDENT_CLASH_MODE = "clique"
+
+
+def build_service():
+    """Load the dataset, build the model once and return the service state (a dict)."""
+    t0 = time.perf_counter()
+    dataset = load_dataset()
+    instance = prepare_instance(
+        dataset['df_courses'], dataset['df_rooms'], dataset['df_students'],
+        enrollment=dataset['enrollment'], student_clashes=clash_graph_from_bundles(*dataset['bundles']),
+    )
+    # Every room of the matching type (lab/lecture) gets variables; capacity is a bound
+    type_rooms = build_room_eligibility(instance['df_courses'], instance['df_rooms'], {})
+    prob, model_vars, slot_vars = build_penalty_model(
+        {**instance, 'eligible_rooms': type_rooms}, W1_TIME_PENALTY, W2_PROF_OVERLOAD, PROF_DAILY_LIMIT,
+        formulation=FORMULATION, room_symmetry=ROOM_SYMMETRY, clash_mode=STUDENT_CLASH_MODE,
+        name="OptiTime_Service",
+    )
+
+    room_vars = {}
+    for (c, t, r), var in model_vars.items():
+        room_vars.setdefault((c, r), []).append(var)
+    room_courses = {}
+    for c, rooms in type_rooms.items():
+        for r in rooms:
+            room_courses.setdefault(r, []).append(c)
+
+    svc = {
+        'lock': threading.Lock(),
+        'prob': prob,
+        'model_vars': model_vars,
+        'slot_vars': slot_vars,
+        'room_vars': room_vars,
+        'type_rooms': type_rooms,
+        'room_courses': room_courses,
+        'df_courses': instance['df_courses'],
+        'time_slots': instance['time_slots'],
+        'enrollment': dict(instance['enrollment']),
+        'room_capacity': dict(instance['room_capacity']),
+        'student_courses': {s: set(cs) for s, cs in student_course_lists(dataset).items()},
+        'clash_weights': dict(instance['student_clashes']),
+        'extra_pairs': set(),   # clash pairs added since the clique rows were built (pairwise rows)
+        'pins': {},             # (course, slot) -> room or None
+        'edits_applied': 0,
+        'incumbent': {},        # variable name -> value, last persisted solve (MIP start for later jobs)
+        'timetable': None,
+        'jobs': OrderedDict(),
+        'pool': ThreadPoolExecutor(max_workers=WORKERS),
+        'solver': pulp.PULP_CBC_CMD(msg=False),
+    }
+    _set_room_bounds(svc, list(type_rooms))
+    svc['built_s'] = round(time.perf_counter() - t0, 3)
+    return svc
+
+
+# ==========================================
+# EDITS (model modifications)
+# ==========================================
+def _set_room_bounds(svc, courses, rooms=None):
+    """x[c, t, r] may only be 1 if room r is open and holds course c's enrollment."""
+    for c in courses:
+        req = svc['enrollment'].get(c, 0)
+        for r in svc['type_rooms'].get(c, []):
+            if rooms is not None and r not in rooms:
+                continue
+            cap = svc['room_capacity'][r]
+            ub = 1 if cap > 0 and cap >= req else 0   # capacity 0 closes the room, even for empty courses
+            for var in svc['room_vars'].get((c, r), []):
+                var.upBound = ub
+
+
+def _row_name(name):
+    """The key PuLP stores a constraint under (names are sanitised)."""
+    return pulp.LpConstraint(name=name).name
+
+
+def _add_clash_rows(svc, a, b):
+    """A new clash pair: pairwise rows on top of the clique rows."""
+    for t in svc['time_slots']:
+        members = [svc['slot_vars'][(c, t)] for c in (a, b) if (c, t) in svc['slot_vars']]
+        if len(members) == 2:
+            svc['prob'] += pulp.lpSum(v for vs in members for v in vs) <= 1, f"Stud_Clash_{a}_{b}_{t}"
+    svc['extra_pairs'].add((a, b))
+
+
+def _drop_clash_rows(svc, pairs):
+    """Pairs that no longer share a student (svc['clash_weights'] already updated)."""
+    if all(pair in svc['extra_pairs'] for pair in pairs):
+        for a, b in pairs:
+            svc['extra_pairs'].discard((a, b))
+            for t in svc['time_slots']:
+                svc['prob'].constraints.pop(_row_name(f"Stud_Clash_{a}_{b}_{t}"), None)
+        return
+    # A pair sits inside a clique row: rebuild the clique family from the current clash graph
+    for name in [n for n in svc['prob'].constraints if n.startswith(('Stud_Clique_', 'Stud_Clash_'))]:
+        del svc['prob'].constraints[name]
+    svc['extra_pairs'].clear()
+    add_student_clash_constraints(svc['prob'], svc['slot_vars'], svc['clash_weights'], svc['time_slots'],
+                                  mode=STUDENT_CLASH_MODE)
+
+
+def _check_course(svc, course):
+    if course not in svc['type_rooms']:
+        raise ValueError(f"Unknown course {course}")
+
+
+def _check_slot(svc, slot):
+    if slot not in svc['time_slots']:
+        raise ValueError(f"Unknown time slot {slot} (expected e.g. {svc['time_slots'][0]})")
+
+
+def _add_enrollment(svc, student, course):
+    _check_course(svc, course)
+    courses = svc['student_courses'].get(student, set())
+    if course in courses:
+        raise ValueError(f"{student} is already enrolled in {course}")
+    svc['student_courses'][student] = courses   # a new student only once the edit is valid
+    for other in courses:
+        pair = tuple(sorted((course, other)))
+        if not svc['clash_weights'].get(pair):
+            _add_clash_rows(svc, *pair)
+        svc['clash_weights'][pair] = svc['clash_weights'].get(pair, 0) + 1
+    courses.add(course)
+    svc['enrollment'][course] = svc['enrollment'].get(course, 0) + 1
+    _set_room_bounds(svc, [course])
+    return {'op': 'remove_enrollment', 'student': student, 'course': course}
+
+
+def _remove_enrollment(svc, student, course):
+    courses = svc['student_courses'].get(student, set())
+    if course not in courses:
+        raise ValueError(f"{student} is not enrolled in {course}")
+    courses.discard(course)
+    if not courses:
+        del svc['student_courses'][student]   # e.g. reverting a what-if add for a new student
+    gone = []
+    for other in courses:
+        pair = tuple(sorted((course, other)))
+        svc['clash_weights'][pair] -= 1
+        if not svc['clash_weights'][pair]:
+            del svc['clash_weights'][pair]
+            gone.append(pair)
+    if gone:
+        _drop_clash_rows(svc, gone)
+    svc['enrollment'][course] -= 1
+    _set_room_bounds(svc, [course])
+    return {'op': 'add_enrollment', 'student': student, 'course': course}
+
+
+def _set_room_capacity(svc, room, capacity):
+    if room not in svc['room_capacity']:
+        raise ValueError(f"Unknown room {room}")
+    if not isinstance(capacity, int) or capacity < 0:
+        raise ValueError("capacity must be a non-negative integer")
+    previous = svc['room_capacity'][room]
+    svc['room_capacity'][room] = capacity
+    _set_room_bounds(svc, svc['room_courses'].get(room, []), rooms={room})
+    return {'op': 'set_room_capacity', 'room': room, 'capacity': previous}
+
+
+def _pin(svc, course, slot, room=None):
+    _check_course(svc, course)
+    _check_slot(svc, slot)
+    if (course, slot) in svc['pins']:
+        raise ValueError(f"{course} is already pinned at {slot}")
+    if room is None:
+        vs = svc['slot_vars'].get((course, slot), [])
+    else:
+        vs = [svc['model_vars'][key] for key in [(course, slot, room)] if key in svc['model_vars']]
+    if not vs:
+        raise ValueError(f"{course} cannot be placed at {slot}" + (f" in {room}" if room else ""))
+    svc['prob'] += pulp.lpSum(vs) >= 1, f"Pin_{course}_{slot}"
+    svc['pins'][(course, slot)] = room
+    return {'op': 'unpin', 'course': course, 'slot': slot}
+
+
+def _unpin(svc, course, slot):
+    if (course, slot) not in svc['pins']:
+        raise ValueError(f"{course} is not pinned at {slot}")
+    room = svc['pins'].pop((course, slot))
+    svc['prob'].constraints.pop(_row_name(f"Pin_{course}_{slot}"))
+    return {'op': 'pin', 'course': course, 'slot': slot, 'room': room}
+
+
+EDIT_OPS = {
+    'add_enrollment': (_add_enrollment, ('student', 'course'), ()),
+    'remove_enrollment': (_remove_enrollment, ('student', 'course'), ()),
+    'set_room_capacity': (_set_room_capacity, ('room', 'capacity'), ()),
+    'pin': (_pin, ('course', 'slot'), ('room',)),
+    'unpin': (_unpin, ('course', 'slot'), ()),
+}
+
+
+def apply_edits(svc, edits):
+    """
+    Apply a list of edits (call with svc['lock'] held). All or nothing: if
+    one fails, the ones before it are reverted and ValueError is raised.
+    Returns the inverse edits, in the order they must be applied to undo.
+    """
+    if not isinstance(edits, list):
+        raise ValueError("edits must be a list")
+    inverses = []
+    try:
+        for e in edits:
+            if not isinstance(e, dict) or e.get('op') not in EDIT_OPS:
+                raise ValueError(f"Unknown edit {e!r}; ops: {', '.join(EDIT_OPS)}")
+            func, required, optional = EDIT_OPS[e['op']]
+            missing = [k for k in required if k not in e]
+            if missing:
+                raise ValueError(f"{e['op']} needs {', '.join(missing)}")
+            inverses.append(func(svc, *(e[k] for k in required), **{k: e[k] for k in optional if k in e}))
+    except ValueError:
+        revert_edits(svc, inverses[::-1])
+        raise
+    return inverses[::-1]
+
+
+def revert_edits(svc, inverses):
+    for e in inverses:
+        func, required, optional = EDIT_OPS[e['op']]
+        func(svc, *(e[k] for k in required), **{k: e[k] for k in optional if k in e})
+
+
+# ==========================================
+# JOBS
+# ==========================================
+def run_cbc(svc, mps_path, sol_path, log_path, time_limit, gap_rel, mst_path=None):
+    args = [svc['solver'].path, mps_path]
+    if mst_path:
+        args += ['-mips', mst_path]
+    args += ['-sec', str(time_limit), '-ratio', str(gap_rel), '-solve',
+             '-printingOptions', 'all', '-solution', sol_path]
+    with open(log_path, 'w') as log:
+        subprocess.run(args, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, check=True)
+
+
+def _update_job(svc, job, **fields):
+    """Job fields are written under the lock, so readers can copy a consistent job."""
+    with svc['lock']:
+        job.update(fields)
+
+
+def run_job(svc, job):
+    _update_job(svc, job, status='running', started=time.time())
+    work_dir = tempfile.mkdtemp(prefix='optitime_job_')
+    mps_path, mst_path, sol_path, log_path = (
+        os.path.join(work_dir, name) for name in ('model.mps', 'start.mst', 'model.sol', 'cbc.log')
+    )
+    try:
+        # Snapshot the model with this job's edits; the solve itself needs no lock
+        t = time.perf_counter()
+        with svc['lock']:
+            inverses = apply_edits(svc, job['edits'])
+            try:
+                vs, var_names, con_names, _ = svc['prob'].writeMPS(mps_path, rename=1)
+                warm = bool(svc['incumbent'])
+                if warm:
+                    for v in vs:
+                        v.setInitialValue(svc['incumbent'].get(v.name, 0), check=False)
+                    svc['solver'].writesol(mst_path, svc['prob'], vs, var_names, con_names)
+                objective = [(v.name, coef) for v, coef in svc['prob'].objective.items()]
+                constant = svc['prob'].objective.constant
+            finally:
+                if job['persist']:
+                    svc['edits_applied'] += len(job['edits'])
+                else:
+                    revert_edits(svc, inverses)
+        _update_job(svc, job, snapshot_s=round(time.perf_counter() - t, 3))
+
+        t = time.perf_counter()
+        run_cbc(svc, mps_path, sol_path, log_path, job['time_limit'], job['gap'], mst_path if warm else None)
+        _update_job(svc, job, solve_s=round(time.perf_counter() - t, 3))
+
+        status, values, _, _, _, sol_status = svc['solver'].readsol_MPS(sol_path, svc['prob'], vs, var_names, con_names)
+        with open(log_path, 'r') as f:
+            points, final = parse_cbc_log(f.read())
+        result = {
+            'status': pulp.LpStatus[status],
+            'sol_status': pulp.LpSolution[sol_status],
+            'convergence': summarise(points, final),
+            'gap': final.get('gap'),
+        }
+        if sol_status in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+            result['objective'] = constant + sum(coef * values.get(name, 0) for name, coef in objective)
+            result['timetable'] = timetable_entries(
+                solution_assignments(svc['model_vars'], FORMULATION, None, None, values=values), svc['df_courses']
+            )
+            if job['persist']:
+                with svc['lock']:
+                    svc['incumbent'] = values
+                    svc['timetable'] = result['timetable']
+        _update_job(svc, job, result=result, status='done', finished=time.time())
+    except Exception as e:   # reported through GET /jobs/<id>
+        _update_job(svc, job, status='failed', error=f"{type(e).__name__}: {e}", finished=time.time())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def submit_job(svc, edits, persist=False, time_limit=SOLVER_TIME_LIMIT, gap=SOLVER_GAP_REL):
+    """Validate the edits (applied and reverted at once) and queue a solve. Returns the job dict."""
+    with svc['lock']:
+        revert_edits(svc, apply_edits(svc, edits))
+    job = {
+        'id': uuid.uuid4().hex[:12], 'status': 'queued', 'submitted': time.time(),
+        'edits': edits, 'persist': bool(persist), 'time_limit': float(time_limit), 'gap': float(gap),
+    }
+    with svc['lock']:
+        svc['jobs'][job['id']] = job
+        finished = [j for j in svc['jobs'].values() if j['status'] in ('done', 'failed')]
+        for old in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del svc['jobs'][old['id']]
+    svc['pool'].submit(run_job, svc, job)
+    return job
+
+
+def job_summary(job):
+    summary = {k: v for k, v in job.items() if k != 'result'}
+    if 'result' in job:
+        summary['result'] = {k: v for k, v in job['result'].items() if k != 'timetable'}
+    return summary
+
+
+def service_status(svc):
+    with svc['lock']:
+        states = [j['status'] for j in svc['jobs'].values()]
+        return {
+            'courses': len(svc['type_rooms']),
+            'students': len(svc['student_courses']),
+            'rooms': len(svc['room_capacity']),
+            'variables': len(svc['model_vars']),
+            'constraints': len(svc['prob'].constraints),
+            'clash_pairs': len(svc['clash_weights']),
+            'pins': [{'course': c, 'slot': t, 'room': r} for (c, t), r in svc['pins'].items()],
+            'edits_applied': svc['edits_applied'],
+            'built_s': svc['built_s'],
+            'workers': WORKERS,
+            'jobs': {s: states.count(s) for s in ('queued', 'running', 'done', 'failed')},
+        }
+
+
+# ==========================================
+# HTTP / JSON API
+# ==========================================
+#   GET  /status            model size, pins, queue state
+#   GET  /timetable         timetable of the last persisted solve
+#   POST /edits             {"edits": [...]}: apply to the resident model
+#   POST /jobs              {"edits": [...], "persist": false, "time_limit": 60, "gap": 0.05}
+#   GET  /jobs, /jobs/<id>  job states; a finished job includes its timetable
+# An edit is {"op": ..., ...}:
+#   {"op": "add_enrollment" | "remove_enrollment", "student": "BT2025001", "course": "C9"}
+#   {"op": "set_room_capacity", "room": "P202", "capacity": 0}
+#   {"op": "pin", "course": "C9", "slot": "Mon_1", "room": "A307"}   (room optional)
+#   {"op": "unpin", "course": "C9", "slot": "Mon_1"}
+def make_handler(svc):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body):
+            data = json.dumps(body, default=str).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip('/')
+            if path == '/status':
+                self._send(200, service_status(svc))
+            elif path == '/timetable':
+                with svc['lock']:
+                    timetable = svc['timetable']
+                if timetable is None:
+                    self._send(404, {'error': "no persisted solve yet; POST /jobs with persist=true"})
+                else:
+                    self._send(200, timetable)
+            elif path == '/jobs':
+                with svc['lock']:
+                    jobs = [job_summary(j) for j in svc['jobs'].values()]
+                self._send(200, jobs)
+            elif path.startswith('/jobs/'):
+                # Copied under the lock: the worker thread updates the job dict while it runs
+                with svc['lock']:
+                    job = svc['jobs'].get(path[len('/jobs/'):])
+                    job = dict(job) if job is not None else None
+                if job is None:
+                    self._send(404, {'error': f"not found: {path}"})
+                else:
+                    self._send(200, job)
+            else:
+                self._send(404, {'error': f"not found: {path}"})
+
+        def do_POST(self):
+            path = urlparse(self.path).path.rstrip('/')
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if path == '/edits':
+                    with svc['lock']:
+                        apply_edits(svc, body.get('edits', []))
+                        svc['edits_applied'] += len(body.get('edits', []))
+                    self._send(200, service_status(svc))
+                elif path == '/jobs':
+                    job = submit_job(svc, body.get('edits', []), body.get('persist', False),
+                                     body.get('time_limit', SOLVER_TIME_LIMIT), body.get('gap', SOLVER_GAP_REL))
+                    with svc['lock']:
+                        summary = job_summary(job)
+                    self._send(202, summary)
+                else:
+                    self._send(404, {'error': f"not found: {path}"})
+            except (ValueError, TypeError, AttributeError) as e:   # bad JSON or a rejected edit
+                self._send(400, {'error': str(e)})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OptiTime scheduling service (HTTP/JSON)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+
+    print("Loading data and building the model...")
+    try:
+        svc = build_service()
+    except FileNotFoundError as e:
+        print(f"❌ CRITICAL ERROR: Missing file - {e}")
+        sys.exit(1)
+    status = service_status(svc)
+    print(f"✅ Model ready in {svc['built_s']:g}s: {status['variables']} variables, "
+          f"{status['constraints']} constraints.")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(svc))
+    print(f"Serving on http://{args.host}:{args.port} ({WORKERS} solver workers). Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        svc['pool'].shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import json
+import os
+import time
+from model_cache import cache_key, evict
+
+# ==========================================
+# SOLUTION CACHE
+# ==========================================
+# Finished timetables keyed by the input data, the structural config, the
+# objective weights and the solver's gap setting. The solver time limit is
+# deliberately *not* part of the key: every entry records its status and the
+# budget it was solved with, so a run with a larger budget can take a
+# time-limited 'Feasible' entry as a warm start and improve on it.
+
+SOLUTION_CACHE_DIR = os.path.join('.optitime_cache', 'solutions')
+SOLUTION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def solution_key(input_files, structural_config, weights, solver_options):
+    return cache_key(input_files, {'structure': structural_config, 'weights': weights, 'solver': solver_options})
+
+
+def lookup_solution(key, cache_dir=SOLUTION_CACHE_DIR):
+    """Return the cached entry {status, objective, time_limit, timetable, ...} or None."""
+    path = os.path.join(cache_dir, key + '.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        entry = json.load(f)
+    now = time.time()
+    os.utime(path, (now, now))
+    return entry
+
+
+def is_final(entry, time_limit):
+    """
+    A cached entry can be returned as-is if it is proven optimal, or if it
+    already had at least the budget of this run.
+    """
+    return entry['status'] == 'Optimal' or entry['time_limit'] >= time_limit
+
+
+def store_solution(key, status, objective, time_limit, timetable, cache_dir=SOLUTION_CACHE_DIR,
+                   max_bytes=SOLUTION_CACHE_MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, key + '.json'), 'w') as f:
+        json.dump({
+            'status': status,
+            'objective': objective,
+            'time_limit': time_limit,
+            'solved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'timetable': timetable,
+        }, f)
+    evict(cache_dir, max_bytes)
@@ -0,0 +1,72 @@
+import importlib.util
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# COLUMNAR TIMETABLE OUTPUT
+# ==========================================
+# Compact copy of a timetable next to its JSON, for tools that load large
+# timetables. Both formats hold the same table (Day, Slot, Course, Room, Title).
+#   "npz":     integer-indexed arrays (course / slot / room codes) plus the
+#              lookup tables, NumPy only
+#   "parquet": categorical columns; needs pyarrow (or fastparquet)
+COLUMNAR_FORMATS = ("npz", "parquet")
+NPZ_FORMAT_VERSION = 1
+
+
+def parquet_available():
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def columnar_path(timetable_path, fmt):
+    return timetable_path.rsplit('.json', 1)[0] + '.' + fmt
+
+
+def write_columnar(entries, path, fmt, time_slots):
+    """Write timetable entries (the JSON records) in a columnar format."""
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    df = pd.DataFrame(entries, columns=['Day', 'Slot', 'Course', 'Room', 'Title'])
+
+    if fmt == "parquet":
+        for col in ('Day', 'Course', 'Room', 'Title'):
+            df[col] = df[col].astype('category')
+        df['Slot'] = df['Slot'].astype('int8')
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow (or use the npz format)") from e
+        return
+
+    slot_idx = {t: i for i, t in enumerate(time_slots)}
+    course_codes, courses = pd.factorize(df['Course'])
+    room_codes, rooms = pd.factorize(df['Room'])
+    titles = df.drop_duplicates('Course').set_index('Course')['Title'].reindex(courses)
+    np.savez(
+        path,
+        version=np.array(NPZ_FORMAT_VERSION),
+        course=course_codes.astype(np.int32),
+        slot=np.array([slot_idx[f"{d}_{s}"] for d, s in zip(df['Day'], df['Slot'])], dtype=np.int16),
+        room=room_codes.astype(np.int32),
+        courses=np.asarray(courses, dtype=str),
+        titles=np.asarray(titles.fillna('').values, dtype=str),
+        rooms=np.asarray(rooms, dtype=str),
+        time_slots=np.asarray(time_slots, dtype=str),
+    )
+
+
+def read_columnar(path):
+    """Load a columnar timetable back as a DataFrame with the JSON columns."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    with np.load(path) as z:
+        # Split the lookup table, not the rows, so an empty timetable still gets every column
+        days, slots = zip(*(t.split('_') for t in z['time_slots'].tolist())) if len(z['time_slots']) else ((), ())
+        slot = z['slot']
+        return pd.DataFrame({
+            'Day': np.asarray(days, dtype=str)[slot],
+            'Slot': np.asarray(slots, dtype=int)[slot],
+            'Course': z['courses'][z['course']],
+            'Room': z['rooms'][z['room']],
+            'Title': z['titles'][z['course']],
+        })
@@ -1,6 +1,7 @@
 import pandas as pd
 import json
 import sys
+from dataset import load_dataset
 
 # ==========================================
 # 1. CONFIGURATION & LOADING
@@ -8,8 +9,9 @@ import sys
 def load_data():
     print("Loading Data for Validation...")
     try:
-        df_courses = pd.read_csv('courses.csv')
-        df_students = pd.read_csv('student_data_large.csv')
+        # Courses and enrollments from the binary dataset (compiled from the CSVs when they changed)
+        dataset = load_dataset()
+        df_courses, df_students = dataset['df_courses'], dataset['df_students']
         with open('timetable_output.json', 'r') as f:
             schedule_data = json.load(f)
         df_schedule = pd.DataFrame(schedule_data)
@@ -56,66 +58,40 @@ def validate_schedule(df_courses, df_students, df_schedule):
     # ==========================================
     print("\n[2] Checking Student Clashes (This may take a moment)...")
     
-    # Optimization: Create a lookup for when courses are happening
-    # Structure: course_id -> list of (Day, Slot) tuples
-    course_timing = {}
-    for _, row in df_schedule.iterrows():
-        c = row['Course']
-        time_key = (row['Day'], row['Slot'])
-        if c not in course_timing: course_timing[c] = []
-        course_timing[c].append(time_key)
+    # Every (student, Day, Slot) the student is busy: one merge of enrollments with the schedule.
+    # If (Mon, 1) appears twice for a student, they are in two places at once
+    n_students = df_students['student_id'].nunique()
+    busy = df_students[['student_id', 'course_id']].merge(
+        df_schedule[['Course', 'Day', 'Slot']].astype({'Day': 'category'}), left_on='course_id', right_on='Course'
+    )[['student_id', 'Day', 'Slot']]
+    busy_count = busy.groupby(['student_id', 'Day', 'Slot'], sort=False, observed=True).size()
+    duplicates = busy_count[busy_count > 1].reset_index().sort_values(['student_id', 'Day', 'Slot'])
+    clash_students = duplicates['student_id'].unique()
+    error_count += len(clash_students)
 
-    # Group students by ID and get their course list
-    student_groups = df_students.groupby('student_id')['course_id'].apply(list)
-    
-    clash_list = []
-    
-    for student_id, courses in student_groups.items():
-        # Find all time slots this student is busy
-        busy_slots = []
-        for c in courses:
-            if c in course_timing:
-                busy_slots.extend(course_timing[c])
-        
-        # Check for duplicates in busy_slots
-        # If (Mon, 1) appears twice, the student is in two places at once
-        seen = set()
-        duplicates = set()
-        for slot in busy_slots:
-            if slot in seen:
-                duplicates.add(slot)
-            else:
-                seen.add(slot)
-        
-        if duplicates:
-            clash_list.append(f"   🔴 Student {student_id} has clash at {list(duplicates)}")
-            error_count += 1
-
-    if not clash_list:
-        print(f"   ✅ PASS: Checked {len(student_groups)} students. Zero clashes found.")
+    if len(clash_students) == 0:
+        print(f"   ✅ PASS: Checked {n_students} students. Zero clashes found.")
     else:
-        print(f"   ❌ FAIL: Found {len(clash_list)} students with clashes.")
+        print(f"   ❌ FAIL: Found {len(clash_students)} students with clashes.")
         # Print first 5 only to avoid spamming console
-        for c in clash_list[:5]: print(c)
-        if len(clash_list) > 5: print(f"   ... and {len(clash_list)-5} more.")
+        first = duplicates[duplicates['student_id'].isin(clash_students[:5])]
+        for student_id, slots in first.groupby('student_id', sort=False, observed=True):
+            print(f"   🔴 Student {student_id} has clash at {[(d, int(t)) for d, t in zip(slots['Day'], slots['Slot'])]}")
+        if len(clash_students) > 5: print(f"   ... and {len(clash_students)-5} more.")
 
     # ==========================================
     # CHECK 3: PROFESSOR WORKLOAD (Soft Constraint)
     # ==========================================
     print("\n[3] Analyzing Professor Workload (Soft Constraint)...")
     
-    # Build Instructor Map
-    inst_schedule = []
-    for idx, row in df_courses.iterrows():
-        instructors = [row['instructor1'], row['instructor2']]
-        for inst in instructors:
-            if pd.notna(inst) and inst != 'TBD':
-                # Get slots for this course
-                course_slots = df_schedule[df_schedule['Course'] == row['course_id']]
-                for _, s_row in course_slots.iterrows():
-                    inst_schedule.append({'Instructor': inst, 'Day': s_row['Day'], 'Slot': s_row['Slot']})
-    
-    df_inst = pd.DataFrame(inst_schedule)
+    # Instructor -> Course pairs (both instructor columns, TBD excluded), joined to the schedule
+    teaching = df_courses.melt(
+        id_vars='course_id', value_vars=['instructor1', 'instructor2'], value_name='Instructor'
+    )
+    teaching = teaching[teaching['Instructor'].notna() & (teaching['Instructor'] != 'TBD')]
+    df_inst = teaching[['course_id', 'Instructor']].merge(
+        df_schedule[['Course', 'Day', 'Slot']], left_on='course_id', right_on='Course'
+    )[['Instructor', 'Day', 'Slot']]
     
     if not df_inst.empty:
         # Count hours per day per instructor
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import plotly.express as px
 import datetime
+import os
+from preprocess import DAYS, SLOTS_PER_DAY, make_time_slots, student_course_lists
+from dataset import SOURCE_FILES, load_dataset
 
 # ==========================================
 # CONFIG & STYLING
@@ -28,38 +32,52 @@ st.markdown(
 # ==========================================
 # DATA SETUP
 # ==========================================
-@st.cache_data
+#use "new_timetable_output.json" to view old model results(without objective function)
+SCHEDULE_FILE = "timetable_output.json"
+
+
+def data_stamp():
+    """
+    (path, size, mtime) of every input. A new stamp -- an edited CSV or a
+    freshly solved timetable -- makes build_indexes() rebuild.
+    """
+    stamp = []
+    for path in [*SOURCE_FILES.values(), SCHEDULE_FILE]:
+        try:
+            info = os.stat(path)
+            stamp.append((path, info.st_size, info.st_mtime_ns))
+        except OSError:
+            stamp.append((path, None, None))
+    return tuple(stamp)
+
+
 def load_data():
-    df_courses = pd.DataFrame()
-    df_students = pd.DataFrame()
+    """
+    Courses, rooms and enrollments come from the binary dataset (dataset.py),
+    which is recompiled automatically when a CSV changed.
+    """
+    dataset = None
     df_schedule = pd.DataFrame()
 
     try:
-        df_courses = pd.read_csv("courses.csv")
+        # Names are kept once per student, not once per enrollment row
+        dataset = load_dataset(names=True)
+    except ValueError:
+        st.error(f"❌ 'student_data_large.csv' missing required columns.")
+        return dataset, df_schedule
     except Exception as e:
-        st.error(f"❌ Error reading 'courses.csv': {e}")
-        return df_courses, df_students, df_schedule
+        st.error(f"❌ Error loading the input data: {e}")
+        return dataset, df_schedule
 
     try:
-        df_students = pd.read_csv("student_data_large.csv")
-        required_cols = ["student_id", "student_name", "course_id"]
-        if not all(col in df_students.columns for col in required_cols):
-            st.error(f"❌ 'student_data_large.csv' missing required columns.")
-            return df_courses, pd.DataFrame(), df_schedule
-    except Exception as e:
-        st.error(f"❌ Error reading 'student_data_large.csv': {e}")
-        return df_courses, pd.DataFrame(), df_schedule
-
-    try:
-        #use "new_timetable_output.json" to view old model results(without objective function)
-        with open("timetable_output.json", "r") as f:
+        with open(SCHEDULE_FILE, "r") as f:
             schedule_data = json.load(f)
         df_schedule = pd.DataFrame(schedule_data)
     except Exception as e:
         st.error(f"❌ Error loading schedule JSON: {e}")
-        return df_courses, df_students, pd.DataFrame()
+        return dataset, pd.DataFrame()
 
-    return df_courses, df_students, df_schedule
+    return dataset, df_schedule
 
 
 # ==========================================
@@ -74,28 +92,126 @@ def style_timetable(val):
         return ""
 
 
-def get_student_data(student_id, df_students, df_schedule, df_courses):
-    if df_students.empty:
-        return None, pd.DataFrame(), pd.DataFrame(), []
+@st.cache_resource(max_entries=1)
+def build_indexes(stamp):
+    """
+    Lookup tables built once per data_stamp(), so switching students,
+    instructors or rooms never scans the enrollment or schedule frames:
+      names[student_id]         -> student name
+      student_courses[sid]      -> enrolled course ids (file order, no duplicates)
+      course_rows[course_id]    -> positions of the course's rows in the schedule
+      courses                   -> df_courses indexed by course_id
+      instructor_rows / room_rows, instructor_load / room_occupancy
+                                -> see build_staff_indexes()
+    cache_resource hands back the same object on every rerun instead of
+    unpickling a copy, which would cost O(enrollments) per click.
+    """
+    dataset, df_schedule = load_data()
+    df_courses = dataset["df_courses"] if dataset else pd.DataFrame()
+    idx = {
+        "stamp": stamp,
+        "schedule": df_schedule,
+        "student_ids": [],
+        "names": {},
+        "student_courses": {},
+        "course_rows": {},
+        "courses": pd.DataFrame(),
+    }
+    if not df_schedule.empty and "Course" in df_schedule.columns:
+        idx["course_rows"] = df_schedule.groupby("Course", sort=False).indices
+    if not df_courses.empty and "course_id" in df_courses.columns:
+        idx["courses"] = df_courses.drop_duplicates("course_id").set_index("course_id", drop=False)
+    if dataset is None:
+        build_staff_indexes(idx, {}, pd.DataFrame(columns=["room", "capacity"]))
+        return idx
+    build_staff_indexes(idx, dataset["instructor_map"], dataset["df_rooms"])
+
+    # The dataset keeps the student table sorted
+    idx["student_ids"] = dataset["students"].tolist()
+    idx["names"] = dict(zip(idx["student_ids"], dataset["student_names"].tolist()))
+    idx["student_courses"] = student_course_lists(dataset)
+    return idx
+
 
-    student_info = df_students[df_students["student_id"] == student_id]
-    if student_info.empty:
+def build_staff_indexes(idx, instructor_map, df_rooms):
+    """
+    Inverted indexes for the instructor and room views:
+      instructor_rows[name] / room_rows[room] -> schedule row positions
+      instructor_load[i, t]  classes instructor i teaches at time slot t
+      room_occupancy[r, t]   classes held in room r at time slot t
+    with instructor_pos / room_pos giving the matrix row of each name.
+    Time slots follow preprocess.make_time_slots() (day-major).
+    """
+    df_schedule = idx["schedule"]
+    n_slots = SLOTS_PER_DAY
+    if not df_schedule.empty and "Slot" in df_schedule.columns:
+        n_slots = max(n_slots, int(df_schedule["Slot"].max()))
+    idx["days"] = list(DAYS)
+    idx["slots_per_day"] = n_slots
+    time_slots = make_time_slots(DAYS, n_slots)
+    slot_pos = {t: i for i, t in enumerate(time_slots)}
+
+    scheduled = not df_schedule.empty and {"Day", "Slot", "Room"} <= set(df_schedule.columns)
+    if scheduled:
+        row_slot = (df_schedule["Day"] + "_" + df_schedule["Slot"].astype(str)).map(slot_pos)
+        known = row_slot.notna().to_numpy()
+        row_slot = row_slot.fillna(-1).to_numpy(dtype=np.int64)
+        room_rows = df_schedule.groupby("Room", sort=False).indices
+    else:
+        row_slot, known, room_rows = np.zeros(len(df_schedule), dtype=np.int64), np.zeros(len(df_schedule), dtype=bool), {}
+
+    instructor_rows = {}
+    for inst, cids in instructor_map.items():
+        rows = [idx["course_rows"][c] for c in cids if c in idx["course_rows"]]
+        instructor_rows[inst] = np.sort(np.concatenate(rows)) if rows else np.array([], dtype=np.int64)
+
+    rooms = list(dict.fromkeys([*df_rooms["room"].tolist(), *room_rows]))
+    idx["room_capacity"] = df_rooms.set_index("room")["capacity"].to_dict()
+    idx["room_rows"] = room_rows
+    idx["instructor_rows"] = instructor_rows
+    idx["room_pos"] = {r: i for i, r in enumerate(rooms)}
+    idx["instructor_pos"] = {inst: i for i, inst in enumerate(instructor_rows)}
+
+    occupancy = np.zeros((len(rooms), len(time_slots)), dtype=np.int16)
+    for r, rows in room_rows.items():
+        rows = rows[known[rows]]
+        np.add.at(occupancy[idx["room_pos"][r]], row_slot[rows], 1)
+    load = np.zeros((len(instructor_rows), len(time_slots)), dtype=np.int16)
+    for inst, rows in instructor_rows.items():
+        rows = rows[known[rows]]
+        np.add.at(load[idx["instructor_pos"][inst]], row_slot[rows], 1)
+    idx["room_occupancy"] = occupancy
+    idx["instructor_load"] = load
+
+
+def get_student_data(student_id, idx):
+    name = idx["names"].get(student_id)
+    if name is None:
         return None, pd.DataFrame(), pd.DataFrame(), []
 
-    student_name = student_info["student_name"].iloc[0]
-    enrolled_cids = student_info["course_id"].tolist()
+    enrolled_cids = idx["student_courses"].get(student_id, [])
 
-    if not df_schedule.empty and "Course" in df_schedule.columns:
-        student_sched = df_schedule[df_schedule["Course"].isin(enrolled_cids)]
+    rows = [idx["course_rows"][c] for c in enrolled_cids if c in idx["course_rows"]]
+    if rows:
+        # Sorted positions keep the schedule file order, as the old isin() filter did
+        student_sched = idx["schedule"].iloc[np.sort(np.concatenate(rows))].copy()
     else:
         student_sched = pd.DataFrame()
 
-    if not df_courses.empty and "course_id" in df_courses.columns:
-        s_courses = df_courses[df_courses["course_id"].isin(enrolled_cids)]
+    courses = idx["courses"]
+    if not courses.empty:
+        s_courses = courses[courses.index.isin(enrolled_cids)].reset_index(drop=True)
     else:
         s_courses = pd.DataFrame()
 
-    return student_name, student_sched, s_courses, enrolled_cids
+    return name, student_sched, s_courses, enrolled_cids
+
+
+@st.cache_data(max_entries=1000)
+def student_grid(stamp, student_id):
+    """Weekly grid of one student, memoised per data stamp and student id."""
+    _, s_sched, _, _ = get_student_data(student_id, build_indexes(stamp))
+    return create_timetable_grid(s_sched)
 
 
 def create_timetable_grid(df_sched):
@@ -132,34 +248,136 @@ def create_timetable_grid(df_sched):
     return pivot.sort_index()
 
 
+def slot_matrix(values, idx):
+    """Per-time-slot values (day-major) as a Slot x Day frame for heatmaps."""
+    n = idx["slots_per_day"]
+    return pd.DataFrame(
+        np.asarray(values).reshape(len(idx["days"]), n).T,
+        index=range(1, n + 1),
+        columns=idx["days"],
+    )
+
+
+def utilisation_heatmap(matrix, title, label):
+    fig = px.imshow(
+        matrix,
+        text_auto=True,
+        aspect="auto",
+        color_continuous_scale="Blues",
+        labels=dict(x="Day", y="Slot", color=label),
+        title=title,
+    )
+    fig.update_yaxes(dtick=1)
+    return fig
+
+
+@st.cache_data(max_entries=1000)
+def staff_grid(stamp, kind, key):
+    """Weekly grid of one instructor or room, memoised per data stamp and name."""
+    idx = build_indexes(stamp)
+    rows = idx[f"{kind}_rows"].get(key)
+    if rows is None or not len(rows):
+        return pd.DataFrame()
+    return create_timetable_grid(idx["schedule"].iloc[rows].copy())
+
+
+def staff_view(idx, kind):
+    """Instructor or room page: everything comes from the inverted indexes and count matrices."""
+    label = "Instructor" if kind == "instructor" else "Room"
+    pos = idx[f"{kind}_pos"]
+    matrix = idx["instructor_load"] if kind == "instructor" else idx["room_occupancy"]
+    if not pos:
+        st.warning(f"No {label.lower()} data found.")
+        return
+
+    selected = st.sidebar.selectbox(f"Select {label}", sorted(pos, key=str))
+    counts = matrix[pos[selected]]
+    n_slots = matrix.shape[1]
+
+    st.title(f"{label}: {selected}")
+    if kind == "room" and selected in idx["room_capacity"]:
+        st.markdown(f"**Capacity:** `{idx['room_capacity'][selected]}`")
+    st.markdown("---")
+
+    busy = int(np.count_nonzero(counts))
+    per_day = counts.reshape(len(idx["days"]), -1).sum(axis=1)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Weekly Classes", int(counts.sum()), "Sessions")
+    c2.metric("Utilisation", f"{busy / n_slots:.0%}", f"{busy}/{n_slots} slots")
+    c3.metric("Busiest Day", idx["days"][int(per_day.argmax())] if counts.any() else "N/A")
+
+    double_booked = int((counts > 1).sum())
+    if double_booked:
+        st.warning(f"⚠️ {double_booked} time slot(s) with more than one class.")
+
+    tab1, tab2 = st.tabs(["📅 Weekly Timetable", "📊 Utilisation"])
+
+    with tab1:
+        grid = staff_grid(idx["stamp"], kind, selected)
+        if grid.empty:
+            st.info("No classes scheduled.")
+        else:
+            st.dataframe(
+                grid.style.map(style_timetable),
+                use_container_width=True,
+                height=(len(grid) + 1) * 35 + 3,
+            )
+            st.download_button(
+                "📥 Download Schedule (CSV)",
+                grid.to_csv().encode("utf-8"),
+                file_name=f"{selected}_timetable.csv",
+                mime="text/csv",
+            )
+
+    with tab2:
+        st.plotly_chart(
+            utilisation_heatmap(slot_matrix(counts, idx), f"Classes per Slot - {selected}", "Classes"),
+            use_container_width=True,
+        )
+        share = np.round((matrix > 0).mean(axis=0) * 100)
+        st.plotly_chart(
+            utilisation_heatmap(slot_matrix(share, idx), f"% of {label}s in Use per Slot", "% busy"),
+            use_container_width=True,
+        )
+        ranking = pd.DataFrame({
+            label: list(pos),
+            "Weekly Classes": matrix.sum(axis=1),
+            "Utilisation %": np.round(np.count_nonzero(matrix, axis=1) / n_slots * 100, 1),
+        }).sort_values("Utilisation %", ascending=False)
+        st.dataframe(ranking, hide_index=True, use_container_width=True)
+
+
 # ==========================================
 # MAIN UI
 # ==========================================
 def main():
-    df_courses, df_students, df_schedule = load_data()
+    idx = build_indexes(data_stamp())
 
     st.sidebar.title("🎓 OptiTime Navigator")
 
-    if df_students.empty:
+    view = st.sidebar.radio("View", ["Student", "Instructor", "Room"], horizontal=True)
+    if view != "Student":
+        staff_view(idx, view.lower())
+        return
+
+    if not idx["names"]:
         st.warning("No student/enrollment data found.")
         return
 
-    student_ids = sorted(df_students["student_id"].unique())
+    student_ids = idx["student_ids"]
     if not student_ids:
         st.warning("No students found.")
         return
 
+    names = idx["names"]
+
     def format_func(x):
-        row = df_students[df_students["student_id"] == x]
-        if not row.empty:
-            return f"{x} - {row['student_name'].iloc[0]}"
-        return str(x)
+        return f"{x} - {names[x]}" if x in names else str(x)
 
     selected_id = st.sidebar.selectbox("Select Student", student_ids, format_func=format_func)
 
-    name, s_sched, s_courses, enrolled_cids = get_student_data(
-        selected_id, df_students, df_schedule, df_courses
-    )
+    name, s_sched, s_courses, enrolled_cids = get_student_data(selected_id, idx)
+    grid = student_grid(idx["stamp"], selected_id)
         # Header
     st.title(f"Welcome, {name}")
     st.markdown(f"**Student ID:** `{selected_id}`")
@@ -178,14 +396,17 @@ def main():
     }
     today_label = day_map[datetime.datetime.today().weekday()]
 
-    today_sched = s_sched[s_sched["Day"] == today_label] if not s_sched.empty else pd.DataFrame()
+    # Today's column of the memoised weekly grid, without the empty slots
+    if not grid.empty and today_label in grid.columns:
+        today_grid = grid.loc[grid[today_label] != "", [today_label]]
+    else:
+        today_grid = pd.DataFrame()
 
     st.subheader(f"Today's Schedule ({today_label})")
 
-    if today_sched.empty:
+    if today_grid.empty:
         st.info("No classes today.")
     else:
-        today_grid = create_timetable_grid(today_sched)
         st.dataframe(today_grid.style.map(style_timetable), use_container_width=True)
 
     if not name:
@@ -214,7 +435,6 @@ def main():
         if s_sched.empty:
             st.info("No classes scheduled.")
         else:
-            grid = create_timetable_grid(s_sched)
             if grid.empty:
                 st.info("Schedule present but missing Slot/Day columns.")
             else: